@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from benchmark_quiz import (
+    STAGES,
+    compare_to_baseline,
+    make_synthetic_corpus,
+    parse_scale,
+    run_benchmark,
+)
+
+
+class TestQuizBenchmark(unittest.TestCase):
+
+    def test_parse_scale(self):
+        """Ensure scales are parsed into bytes and file counts."""
+        self.assertEqual(parse_scale("1KB:1"), (1024, 1))
+        self.assertEqual(parse_scale("1.5MB:10"), (int(1.5 * 1024 ** 2), 10))
+        self.assertEqual(parse_scale("300MB"), (300 * 1024 ** 2, 1))
+
+    def test_synthetic_corpus_is_seeded(self):
+        """Ensure the same seed always writes the same corpus of the requested size."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = make_synthetic_corpus(os.path.join(tmp_dir, "a"), 20000, 4, seed=3)
+            second = make_synthetic_corpus(os.path.join(tmp_dir, "b"), 20000, 4, seed=3)
+            self.assertEqual(len(first), 4)
+            for first_path, second_path in zip(first, second):
+                with open(first_path) as first_file, open(second_path) as second_file:
+                    self.assertEqual(first_file.read(), second_file.read())
+            self.assertEqual(sum(os.path.getsize(path) for path in first), 20000)
+
+    def test_run_benchmark_reports_every_stage(self):
+        """Ensure every pipeline stage is timed and its peak memory recorded."""
+        result = run_benchmark(4096, 2, seed=1)
+        self.assertEqual(list(result["stages"]), STAGES)
+        for measured in result["stages"].values():
+            self.assertGreaterEqual(measured["seconds"], 0)
+            self.assertIn("peak_bytes", measured)
+
+    def test_compare_to_baseline_flags_regressions(self):
+        """Ensure slower stages are reported and noise below the thresholds is ignored."""
+        baseline = {"runs": [{"total_bytes": 1024, "files": 1, "stages": {
+            "load_text": {"seconds": 1.0, "peak_bytes": 1000},
+            "calculate_tfidf": {"seconds": 0.0001, "peak_bytes": 1000},
+        }}]}
+        results = {"runs": [{"total_bytes": 1024, "files": 1, "stages": {
+            "load_text": {"seconds": 1.5, "peak_bytes": 1100},
+            "calculate_tfidf": {"seconds": 0.0002, "peak_bytes": 1000},
+        }}]}
+        regressions = compare_to_baseline(results, baseline, tolerance=0.2)
+        self.assertEqual([(r["stage"], r["metric"]) for r in regressions], [("load_text", "seconds")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,53 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+import generate_quiz
 from generate_quiz import (
+    load_document,
     load_text,
     preprocess_text_for_matching,
     calculate_tfidf,
+    load_or_fit_corpus_tfidf,
+    fit_corpus_tfidf,
+    fit_corpus_tfidf_from_counts,
+    count_terms,
+    TermScores,
+    VocabularyOptions,
+    discover_test_bank_files,
+    DocumentCache,
+    QuizMemo,
+    build_chunked_artifacts,
+    iter_document_chunks,
+    sample_term_sentences,
+    QuizEngine,
+    PipelineMetrics,
+    derive_file_seed,
+    build_sentence_index,
+    split_sentences,
+    Statements,
+    build_distractor_table,
+    corpus_term_similarity,
+    tfidf_scores_from_row,
     select_quiz_terms,
+    select_top_quiz_terms,
+    tfidf_row_arrays,
     generate_true_false_statements,
     generate_quizzes_for_files,
+    generate_quiz_variants_for_files,
+    iter_quizzes_for_files,
+    iter_prefetched,
+    export_quiz_stream,
+    export_quizzes_to_files,
+    main,
 )
 
 class TestQuizGenerator(unittest.TestCase):
@@ -31,6 +73,16 @@ class TestQuizGenerator(unittest.TestCase):
         cls.quiz_terms = select_quiz_terms(cls.tfidf_scores, n_terms=5, variation=2)
         cls.statements = generate_true_false_statements(cls.sample_text, cls.quiz_terms, num_questions=5)
 
+    def _write_chapters(self, tmp_dir, count):
+        """Writes count chapters of the sample text, each with a topic of its own, and returns their paths."""
+        file_paths = []
+        for i in range(count):
+            file_path = os.path.join(tmp_dir, f"chapter{i}.txt")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(self.sample_text + f" Chapter {i} covers topic{i} in depth.")
+            file_paths.append(file_path)
+        return file_paths
+
     def test_minimum_statement_generation(self):
         """Verify the algorithm generates as many statements as possible."""
         # Check that the number of statements does not exceed the available data
@@ -50,6 +102,16 @@ class TestQuizGenerator(unittest.TestCase):
         unique_statements = {statement for statement, _ in self.statements}
         self.assertEqual(len(unique_statements), len(self.statements))
 
+    def test_repeated_sentences_give_unique_statements(self):
+        """Ensure a sentence repeated in the document is never asked twice."""
+        text = "Arrays store elements. " * 3 + "Stacks hold elements."
+        for seed in range(200):
+            statements = generate_true_false_statements(
+                text, ["Arrays", "elements", "Stacks"], num_questions=5, seed=seed,
+            )
+            texts = [statement for statement, _ in statements]
+            self.assertEqual(len(set(texts)), len(texts))
+
     def test_feedback_for_true_response(self):
         """Verify feedback for 'True' responses to factual statements."""
         print("Processed Text Terms:", self.processed_text_terms)
@@ -241,5 +303,658 @@ class TestQuizGenerator(unittest.TestCase):
             f"No statement relates to any of the specified topics: {topics}."
         )
 
+    def test_load_document_detects_encoding_once(self):
+        """Ensure documents are decoded in memory and carry their encoding, with tokens computed on first use."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            utf8_path = os.path.join(tmp_dir, "utf8.txt")
+            with open(utf8_path, "wb") as file:
+                file.write("Na\u00efve arrays.\r\nSorted arrays.".encode("utf-8"))
+            latin1_path = os.path.join(tmp_dir, "latin1.txt")
+            with open(latin1_path, "wb") as file:
+                file.write("Caf\u00e9 queues.".encode("latin1"))
+
+            document = load_document(utf8_path)
+            self.assertEqual(document.encoding, "utf-8")
+            self.assertEqual(document.text, "Na\u00efve arrays.\nSorted arrays.")
+            self.assertNotIn("tokens", vars(document))
+            self.assertEqual(document.tokens, preprocess_text_for_matching(document.text))
+            self.assertEqual(load_text(utf8_path), document.text)
+
+            document = load_document(latin1_path)
+            self.assertEqual(document.encoding, "latin1")
+            self.assertEqual(document.text, "Caf\u00e9 queues.")
+
+    def test_load_document_memory_maps_large_files(self):
+        """Ensure files above the threshold are decoded from a memory map."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "large.txt")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(self.sample_text)
+
+            original_threshold = generate_quiz.MMAP_THRESHOLD
+            generate_quiz.MMAP_THRESHOLD = 1
+            try:
+                self.assertEqual(load_document(file_path).text, self.sample_text)
+            finally:
+                generate_quiz.MMAP_THRESHOLD = original_threshold
+
+    def test_top_term_selection_stays_in_variation_window(self):
+        """Ensure array-based selection only draws from the top n_terms * variation terms."""
+        import numpy as np
+
+        terms = np.array([f"term{i}" for i in range(1000)], dtype=object)
+        scores = np.arange(1000, dtype=float)
+        for seed in range(20):
+            selected = select_top_quiz_terms(terms, scores, n_terms=5, variation=3, rng=random.Random(seed))
+            self.assertEqual(len(selected), 5)
+            self.assertTrue(all(int(term[4:]) >= 1000 - 15 for term in selected), selected)
+            self.assertIn("term999", selected, "The top-ranked term is always visited first.")
+
+        selected = select_top_quiz_terms(terms, scores, n_terms=3, variation=3,
+                                         guaranteed_terms=["term5", "missing"], rng=random.Random(0))
+        self.assertEqual(selected[0], "term5")
+        self.assertEqual(len(selected), 3)
+
+    def test_tfidf_row_arrays_match_score_dict(self):
+        """Ensure the sparse row arrays hold the same scores as the dict view."""
+        texts = [self.sample_text, "Linked lists store nodes that point to the next node."]
+        vectorizer, tfidf_matrix = load_or_fit_corpus_tfidf(["a.txt", "b.txt"], texts)
+        feature_names = vectorizer.get_feature_names_out()
+        terms, scores = tfidf_row_arrays(tfidf_matrix, 1, feature_names)
+        self.assertEqual(dict(zip(terms, scores)), tfidf_scores_from_row(tfidf_matrix, 1, feature_names))
+
+    def test_sentence_index_lists_matching_sentences(self):
+        """Ensure the inverted index maps each term to the sentences and offsets of its whole-word matches."""
+        sentences = ["Fixed arrays store elements", "Stacks are LIFO", "Arrays of arrays hold arrays"]
+        index = build_sentence_index(sentences, ["arrays", "LIFO", "array", "queues"])
+        self.assertEqual(index, {
+            "arrays": [(0, [(6, 12)]), (2, [(10, 16), (22, 28)])],
+            "LIFO": [(1, [(11, 15)])],
+        })
+
+        # Overlapping terms are each matched on their own, whatever else is indexed
+        sentences = split_sentences("A binary search halves the range. Each binary search is fast. A binary tree branches.")
+        index = build_sentence_index(sentences, ["binary", "binary search", "search"])
+        self.assertEqual([sentence_id for sentence_id, _ in index["binary"]], [0, 1, 2])
+        self.assertEqual(index["binary"], build_sentence_index(sentences, ["binary"])["binary"])
+        self.assertEqual(index["binary search"], [(0, [(2, 15)]), (1, [(5, 18)])])
+        self.assertEqual(build_sentence_index(sentences, ["search halves"]), {"search halves": [(0, [(9, 22)])]})
+        self.assertEqual(build_sentence_index(sentences, ["range. Each"]), {})
+
+    def test_split_sentences_stores_offsets(self):
+        """Ensure sentences end at terminal punctuation or line breaks and are stored as offsets into the text."""
+        text = "Is a stack LIFO? Yes! Queues are FIFO. Version 3.5 of the list\n\n* Heaps keep order.  "
+        sentences = split_sentences(text)
+        self.assertEqual(list(sentences), [
+            "Is a stack LIFO?", "Yes!", "Queues are FIFO.", "Version 3.5 of the list", "* Heaps keep order.",
+        ])
+        self.assertIs(sentences.text, text)
+        self.assertEqual((sentences.starts[2], sentences.ends[2]), (22, 38))
+        self.assertEqual(sentences[-1], "* Heaps keep order.")
+
+        terms = ["stack", "FIFO", "list", "order"]
+        self.assertEqual(build_sentence_index(sentences, terms), build_sentence_index(list(sentences), terms))
+
+    def test_false_statements_replace_whole_words_by_position(self):
+        """Ensure a false statement replaces every whole-word occurrence of its term, and nothing inside other words."""
+        class AlwaysFalse(random.Random):
+            def choice(self, seq):
+                return False
+
+        sentences = ["Stacks hold stack frames and a stack pointer"]
+        terms = ["stack", "queue"]
+        statements = generate_true_false_statements(
+            None, terms, num_questions=1, rng=AlwaysFalse(0), sentences=sentences,
+            distractors={"stack": ["queue"], "queue": ["stack"]},
+        )
+        self.assertEqual(statements, [("Stacks hold QUEUE frames and a QUEUE pointer", False)])
+
+    def test_statements_are_integer_records_rendered_when_read(self):
+        """Ensure statements store ids and spans, render on access, and pickle only the sentences they use."""
+        sentences = split_sentences("Stacks are LIFO. A queue is FIFO. A stack has a top. Heaps are trees.")
+        statements = Statements(sentences, ["stack", "queue"])
+        statements.append(2, 0, 1, [(2, 7)])
+        statements.append(1, 1)
+        self.assertEqual(statements, [("A QUEUE has a top.", False), ("A queue is FIFO.", True)])
+        self.assertEqual(statements[-1], ("A queue is FIFO.", True))
+        self.assertEqual(list(statements.sentence_ids), [2, 1])
+
+        restored = pickle.loads(pickle.dumps(statements))
+        self.assertEqual(restored, statements)
+        self.assertEqual(restored.sentences, ("A queue is FIFO.", "A stack has a top."))
+        self.assertEqual(statements.compact(), statements)
+
+    def test_distractor_table_ranks_co_occurring_terms_first(self):
+        """Ensure each term's replacements are ranked by similarity, most plausible first."""
+        sentences = ["stack push pop", "stack push", "queue enqueue", "queue enqueue dequeue", "pop push"]
+        terms = ["stack", "push", "queue", "enqueue"]
+        index = build_sentence_index(sentences, terms)
+        table = build_distractor_table(terms, index, len(sentences))
+        self.assertEqual(table["stack"][0], "push")
+        self.assertEqual(table["queue"][0], "enqueue")
+        self.assertEqual(sorted(table["stack"]), ["enqueue", "push", "queue"])
+        self.assertEqual(build_distractor_table(["stack"], index, len(sentences)), {"stack": []})
+
+    def test_corpus_term_similarity(self):
+        """Ensure terms weighted in the same documents are similar and unknown terms are not."""
+        texts = ["stacks push pop stacks", "queues enqueue queues", "stacks push stacks"]
+        vectorizer, tfidf_matrix = fit_corpus_tfidf(texts)
+        similarity = corpus_term_similarity(
+            tfidf_matrix.tocsc(), vectorizer.get_feature_names_out(), ["stacks", "push", "queues", "missing"],
+        )
+        self.assertAlmostEqual(similarity[0, 0], 1.0)
+        self.assertGreater(similarity[0, 1], similarity[0, 2])
+        self.assertEqual(similarity[3].tolist(), [0.0, 0.0, 0.0, 0.0])
+
+    def test_generation_stops_when_candidates_run_out(self):
+        """Ensure every (sentence, term) pair is drawn at most once and generation ends early."""
+        text = "Arrays store elements. Stacks push elements. Queues hold elements"
+        statements = generate_true_false_statements(text, ["elements"], num_questions=10, max_attempts=1000)
+        # With a single term there are no false replacements, so only the three true sentences remain
+        self.assertLessEqual(len(statements), 3)
+        self.assertTrue(all(is_true for _, is_true in statements))
+
+    def test_corpus_tfidf_rows_per_document(self):
+        """Ensure the corpus model yields one row of scores per document."""
+        texts = [self.sample_text, "Linked lists store nodes that point to the next node."]
+        vectorizer, tfidf_matrix = load_or_fit_corpus_tfidf(["a.txt", "b.txt"], texts)
+        self.assertEqual(tfidf_matrix.shape[0], 2)
+
+        feature_names = vectorizer.get_feature_names_out()
+        second_scores = tfidf_scores_from_row(tfidf_matrix, 1, feature_names)
+        self.assertIn("nodes", second_scores)
+        self.assertNotIn("arrays", second_scores, "Scores should only cover terms in the document.")
+
+    def test_corpus_tfidf_model_reused_until_corpus_changes(self):
+        """Ensure the saved model is reused for an unchanged corpus and refitted otherwise."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "tfidf_model.joblib")
+            first, _ = load_or_fit_corpus_tfidf(["a.txt"], [self.sample_text], model_path)
+            self.assertTrue(os.path.exists(model_path))
+
+            reused, _ = load_or_fit_corpus_tfidf(["a.txt"], [self.sample_text], model_path)
+            self.assertEqual(list(reused.get_feature_names_out()), list(first.get_feature_names_out()))
+
+            refitted, _ = load_or_fit_corpus_tfidf(["a.txt"], ["Pointers reference memory."], model_path)
+            self.assertIn("pointers", refitted.get_feature_names_out())
+
+    def test_generate_quizzes_for_files_uses_corpus_model(self):
+        """Ensure quizzes are generated for every file with a shared corpus model."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = []
+            for name, text in [("arrays.txt", self.sample_text),
+                               ("lists.txt", "Linked lists store nodes. Each node points to the next node.")]:
+                file_path = os.path.join(tmp_dir, name)
+                with open(file_path, "w", encoding="utf-8") as file:
+                    file.write(text)
+                file_paths.append(file_path)
+
+            model_path = os.path.join(tmp_dir, "model.joblib")
+            quizzes = generate_quizzes_for_files(file_paths, num_questions=3, model_path=model_path)
+            self.assertEqual(list(quizzes), ["arrays.txt", "lists.txt"])
+            self.assertTrue(os.path.exists(model_path))
+            self.assertGreater(len(quizzes["arrays.txt"]), 0)
+
+    def test_parallel_generation_matches_sequential(self):
+        """Ensure a seeded run gives the same quizzes whatever the number of workers."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 4)
+
+            sequential = generate_quizzes_for_files(file_paths, num_questions=4, seed=7)
+            parallel = generate_quizzes_for_files(file_paths, num_questions=4, workers=3, seed=7)
+            self.assertEqual(sequential, parallel)
+            self.assertEqual(list(parallel), [f"chapter{i}.txt" for i in range(4)])
+
+    def test_streaming_quizzes_match_batch_generation(self):
+        """Ensure the streaming generator yields the same quizzes as the batch API."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 3)
+
+            streamed = iter_quizzes_for_files(file_paths, num_questions=3, seed=11)
+            self.assertEqual(next(streamed)[0], "chapter0.txt")
+            batch = generate_quizzes_for_files(file_paths, num_questions=3, seed=11)
+            self.assertEqual(dict(iter_quizzes_for_files(file_paths, num_questions=3, seed=11)), batch)
+
+    def test_export_jsonl_and_csv(self):
+        """Ensure machine-readable formats write one record per statement."""
+        quizzes = {"arrays.txt": [("Arrays are fast.", True), ("STACKS are fast.", False)]}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with_answers_file, without_answers_file = export_quizzes_to_files(quizzes, tmp_dir, "jsonl")
+            with open(with_answers_file) as file:
+                records = [json.loads(line) for line in file]
+            self.assertEqual(records[1], {"file": "arrays.txt", "number": 2, "statement": "STACKS are fast.", "answer": False})
+            with open(without_answers_file) as file:
+                self.assertNotIn("answer", json.loads(file.readline()))
+
+            with_answers_file, _ = export_quizzes_to_files(quizzes, os.path.join(tmp_dir, "csv"), "csv")
+            with open(with_answers_file, newline="") as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(rows[0], ["file", "number", "statement", "answer"])
+            self.assertEqual(rows[1], ["arrays.txt", "1", "Arrays are fast.", "True"])
+
+    def test_export_stream_writes_each_quiz_before_the_next(self):
+        """Ensure each quiz is flushed to disk before the next one is requested."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            seen_sizes = []
+
+            def quiz_stream():
+                yield "a.txt", [("Arrays are fast.", True)]
+                written = [os.path.join(tmp_dir, name) for name in os.listdir(tmp_dir)]
+                seen_sizes.extend(os.path.getsize(path) for path in written)
+                yield "b.txt", [("Stacks are LIFO.", True)]
+
+            with_answers_file, _ = export_quiz_stream(quiz_stream(), tmp_dir, "json")
+            self.assertTrue(seen_sizes and all(size > 0 for size in seen_sizes))
+            with open(with_answers_file) as file:
+                self.assertEqual(list(json.load(file)), ["a.txt", "b.txt"])
+
+    def test_tfidf_from_counts_matches_tfidf_from_texts(self):
+        """Ensure refitting from cached term counts gives the same model as fitting the texts."""
+        import numpy as np
+
+        texts = [self.sample_text, "Linked lists store nodes that point to the next node."]
+        vectorizer, tfidf_matrix = fit_corpus_tfidf(texts)
+        model, counts_matrix = fit_corpus_tfidf_from_counts([count_terms(text) for text in texts])
+        self.assertEqual(list(model.get_feature_names_out()), list(vectorizer.get_feature_names_out()))
+        self.assertTrue(np.allclose(counts_matrix.toarray(), tfidf_matrix.toarray()))
+
+    def test_vocabulary_mode_scores_phrases_within_bounds(self):
+        """Ensure phrase terms are counted verbatim, pruned like scikit-learn, and scored as compact arrays."""
+        import numpy as np
+
+        text = "A linked list of nodes. Binary search\nneeds a sorted array; a linked  list does not."
+        counts = count_terms(text, VocabularyOptions(ngram_range=(1, 2)))
+        self.assertEqual(counts["linked list"], 1)  # The double space is not a phrase
+        self.assertIn("sorted array", counts)
+        self.assertNotIn("search needs", counts)  # Split by a line break
+        self.assertNotIn("list nodes", counts)  # "of" is a stop word
+        self.assertEqual(count_terms(text, VocabularyOptions()), count_terms(text))
+        for ngram_range in [(0, 1), (1, 0), (3, 2)]:
+            with self.assertRaises(ValueError):
+                VocabularyOptions(ngram_range=ngram_range)
+        self.assertEqual(generate_quiz.parse_args(["--ngrams", "2"]).ngrams, 2)
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            generate_quiz.parse_args(["--ngrams", "0"])
+
+        texts = [
+            "A linked list stores nodes. Each node of a linked list points to the next node.",
+            "Binary search halves a sorted array. Binary search needs random access.",
+            "A binary search tree keeps sorted keys. Each node has two children.",
+        ]
+        vocabulary = VocabularyOptions(ngram_range=(1, 2), min_df=2, max_df=0.9)
+        vectorizer, tfidf_matrix = fit_corpus_tfidf(texts, vocabulary)
+        model, counts_matrix = fit_corpus_tfidf_from_counts([count_terms(t, vocabulary) for t in texts], vocabulary)
+        self.assertEqual(list(model.get_feature_names_out()), ["binary", "binary search", "node", "search", "sorted"])
+        self.assertEqual(list(model.get_feature_names_out()), list(vectorizer.get_feature_names_out()))
+        self.assertTrue(np.allclose(counts_matrix.toarray(), tfidf_matrix.toarray()))
+        limited, _ = fit_corpus_tfidf_from_counts(
+            [count_terms(t, vocabulary) for t in texts], VocabularyOptions(ngram_range=(1, 2), max_features=3),
+        )
+        self.assertEqual(len(limited.get_feature_names_out()), 3)
+
+        scores = calculate_tfidf(texts[0], VocabularyOptions(ngram_range=(1, 2)))
+        self.assertIsInstance(scores, TermScores)
+        self.assertEqual(list(scores), sorted(scores))
+        self.assertAlmostEqual(scores["linked list"], dict(scores.items())["linked list"])
+        self.assertNotIn("binary search", scores)
+        self.assertEqual(select_quiz_terms(scores, n_terms=3, variation=1, seed=0), ["linked", "linked list", "list"])
+
+    def test_phrase_terms_flow_through_the_pipeline(self):
+        """Ensure phrase terms are matched and replaced whole, and cached apart from single words."""
+        class AlwaysFalse(random.Random):
+            def choice(self, seq):
+                return False
+
+        sentences = split_sentences("Traversal of a linked list is linear. A binary search is logarithmic.")
+        statements = generate_true_false_statements(
+            None, ["linked list", "binary search"], num_questions=1, rng=AlwaysFalse(0), sentences=sentences,
+        )
+        self.assertIn(statements[0], [("Traversal of a BINARY SEARCH is linear.", False),
+                                      ("A LINKED LIST is logarithmic.", False)])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = []
+            for i, topic in enumerate(["linked list", "binary search", "hash table"]):
+                file_path = os.path.join(tmp_dir, f"chapter{i}.txt")
+                with open(file_path, "w", encoding="utf-8") as file:
+                    file.write(f"The {topic} is covered here. A {topic} is useful. Every {topic} has a cost.")
+                file_paths.append(file_path)
+            cache = DocumentCache(os.path.join(tmp_dir, "cache"))
+            vocabulary = VocabularyOptions(ngram_range=(2, 2), max_features=3)
+
+            words = generate_quizzes_for_files(file_paths, 3, seed=1, cache=cache)
+            phrases = generate_quizzes_for_files(file_paths, 3, seed=1, cache=cache, vocabulary=vocabulary)
+            self.assertEqual(phrases, generate_quizzes_for_files(file_paths, 3, seed=1, vocabulary=vocabulary))
+            self.assertNotEqual(phrases, words)
+            for quiz, topic in zip(phrases.values(), ["linked list", "binary search", "hash table"]):
+                for statement, is_true in quiz:
+                    self.assertIn(topic if is_true else topic.upper(), statement)
+
+    def test_discover_test_bank_files(self):
+        """Ensure every .txt file under the Test Bank is found, in a stable order."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "graphs"))
+            for name in ["b.txt", "a.TXT", "notes.md", os.path.join("graphs", "bfs.txt")]:
+                with open(os.path.join(tmp_dir, name), "w") as file:
+                    file.write("Graphs have nodes.")
+            found = [os.path.relpath(path, tmp_dir) for path in discover_test_bank_files(tmp_dir)]
+            self.assertEqual(found, ["a.TXT", "b.txt", os.path.join("graphs", "bfs.txt")])
+
+    def test_files_with_the_same_name_are_rejected(self):
+        """Ensure chapters with the same name in different subdirectories raise instead of replacing each other."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for topic in ["graphs", "trees"]:
+                os.makedirs(os.path.join(tmp_dir, topic))
+                with open(os.path.join(tmp_dir, topic, "intro.txt"), "w", encoding="utf-8") as file:
+                    file.write(self.sample_text + f" This chapter introduces {topic}.")
+            file_paths = discover_test_bank_files(tmp_dir)
+            with self.assertRaisesRegex(ValueError, "intro.txt"):
+                generate_quizzes_for_files(file_paths, num_questions=3, seed=1)
+            with self.assertRaisesRegex(ValueError, "intro.txt"):
+                QuizEngine(file_paths)
+
+    def test_document_cache_only_reprocesses_changed_files(self):
+        """Ensure a rerun reuses cached artifacts and only reprocesses the edited chapter."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 3)
+            cache_dir = os.path.join(tmp_dir, "cache")
+
+            cache = DocumentCache(cache_dir)
+            uncached = generate_quizzes_for_files(file_paths, num_questions=3, seed=5)
+            first = generate_quizzes_for_files(file_paths, num_questions=3, seed=5, cache=cache)
+            self.assertEqual(first, uncached)
+            self.assertEqual(cache.misses, 3)
+
+            cache = DocumentCache(cache_dir)
+            self.assertEqual(generate_quizzes_for_files(file_paths, num_questions=3, seed=5, cache=cache), first)
+            self.assertEqual(cache.misses, 0)
+
+            with open(file_paths[1], "a", encoding="utf-8") as file:
+                file.write(" Stacks are added in this edition.")
+            cache = DocumentCache(cache_dir)
+            generate_quizzes_for_files(file_paths, num_questions=3, seed=5, cache=cache)
+            self.assertEqual(cache.misses, 1)
+
+    def test_document_cache_evicts_least_recently_used(self):
+        """Ensure the cache stays under its size limit by evicting the oldest entries."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = DocumentCache(tmp_dir, max_bytes=2500)
+            for i in range(5):
+                cache.put(f"entry{i}", "x" * 1000)
+                os.utime(os.path.join(tmp_dir, f"entry{i}.pkl"), ns=(i * 10 ** 9, i * 10 ** 9))
+            self.assertIsNone(cache.get("entry0"))
+            self.assertEqual(cache.get("entry4"), "x" * 1000)
+            total = sum(os.path.getsize(os.path.join(tmp_dir, name))
+                        for name in os.listdir(tmp_dir) if name.endswith(".pkl"))
+            self.assertLessEqual(total, 2500)
+
+    def test_quiz_memo_reuses_quizzes_across_runs_and_engines(self):
+        """Ensure a repeated quiz comes from the memo, and that the memo persists and evicts."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 2)
+            cache = DocumentCache(os.path.join(tmp_dir, "cache"))
+
+            memo = QuizMemo(cache=cache)
+            first = generate_quizzes_for_files(file_paths, num_questions=3, seed=5, cache=cache, memo=memo)
+            self.assertEqual(first, generate_quizzes_for_files(file_paths, num_questions=3, seed=5))
+            self.assertEqual((memo.hits, memo.misses), (0, 2))
+
+            # A new memo over the same cache finds the quizzes on disk, without generating them
+            memo = QuizMemo(cache=cache)
+            metrics = PipelineMetrics()
+            second = generate_quizzes_for_files(file_paths, num_questions=3, seed=5, cache=cache, memo=memo,
+                                                metrics=metrics)
+            self.assertEqual(second, first)
+            self.assertEqual(metrics.snapshot()["counters"]["memo_hits"], 2)
+            self.assertNotIn("generate_statements", metrics.snapshot()["timers"])
+
+            # The engine builds the same keys, so it answers from the batch run's entries
+            engine = QuizEngine(file_paths, cache=cache, memo=memo)
+            self.assertEqual(engine.generate("chapter1.txt", 3, derive_file_seed(5, "chapter1.txt")),
+                             first["chapter1.txt"])
+            self.assertEqual(memo.hits, 3)
+            generate_quizzes_for_files(file_paths, num_questions=4, seed=5, memo=memo)
+            self.assertEqual(memo.misses, 2)
+
+            memo = QuizMemo(max_entries=2)
+            for i in range(3):
+                memo.put(f"key{i}", [("Statement.", True)])
+            self.assertIsNone(memo.get("key0"))
+            self.assertEqual(memo.get("key2"), [("Statement.", True)])
+
+    def test_seed_parameter_matches_seeded_generator(self):
+        """Ensure seed= gives the same draws as passing a generator seeded with it."""
+        import numpy as np
+
+        terms = np.array(["stack", "queue", "heap", "graph", "tree", "array", "list"], dtype=object)
+        scores = np.array([0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3])
+        self.assertEqual(select_top_quiz_terms(terms, scores, n_terms=3, variation=2, seed=4),
+                         select_top_quiz_terms(terms, scores, n_terms=3, variation=2, rng=random.Random(4)))
+        self.assertEqual(
+            generate_true_false_statements(self.sample_text, ["stack", "queue"], 3, seed=8),
+            generate_true_false_statements(self.sample_text, ["stack", "queue"], 3, rng=random.Random(8)),
+        )
+
+    def test_chunked_mode_counts_terms_in_sentence_aligned_windows(self):
+        """Ensure streamed windows end at sentence boundaries and give the same term counts as the whole text."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "arrays.txt")
+            with open(file_path, "w", encoding="utf-8", newline="") as file:
+                file.write(self.sample_text.replace(". Dynamic", ".\r\nDynamic"))
+            document = load_document(file_path)
+
+            windows = list(iter_document_chunks(file_path, chunk_size=128))
+            self.assertGreater(len(windows), 1)
+            self.assertEqual("".join(windows), document.text)
+            sentences = [sentence for window in windows for sentence in split_sentences(window)]
+            self.assertEqual(sentences, list(split_sentences(document.text)))
+
+            artifacts = build_chunked_artifacts(file_path, chunk_size=128)
+            self.assertEqual(artifacts.digest, document.digest)
+            self.assertEqual(artifacts.term_counts, count_terms(document.text))
+            self.assertIsNone(artifacts.sentences)
+            pruned = build_chunked_artifacts(file_path, chunk_size=64, max_terms=3)
+            self.assertEqual(len(pruned.term_counts), 3)
+            self.assertEqual(pruned.term_counts["arrays"], artifacts.term_counts["arrays"])
+
+    def test_chunked_mode_samples_a_bounded_reservoir_of_sentences(self):
+        """Ensure chunked mode keeps at most reservoir_size sentences per term and still generates quizzes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "arrays.txt")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(" ".join(f"Arrays hold item{i}. Stacks hold item{i}." for i in range(200)))
+
+            sampled = sample_term_sentences(file_path, "utf-8", ["Arrays", "Stacks"], reservoir_size=5,
+                                            rng=random.Random(0), chunk_size=256)
+            self.assertEqual(len(sampled), 10)
+            self.assertEqual(sum(sentence.startswith("Arrays") for sentence in sampled), 5)
+            self.assertNotEqual(sampled, sample_term_sentences(file_path, "utf-8", ["Arrays", "Stacks"],
+                                                               reservoir_size=5, rng=random.Random(1),
+                                                               chunk_size=256))
+
+            quizzes = generate_quizzes_for_files([file_path], num_questions=4, seed=3, chunk_size=1024)
+            self.assertEqual(len(quizzes["arrays.txt"]), 4)
+            self.assertEqual(quizzes, generate_quizzes_for_files([file_path], num_questions=4, seed=3,
+                                                                 chunk_size=1024))
+            cache = DocumentCache(os.path.join(tmp_dir, "cache"))
+            streamed = dict(iter_quizzes_for_files([file_path], num_questions=4, seed=3, cache=cache,
+                                                   chunk_size=1024))
+            self.assertEqual(streamed, quizzes)
+
+    def test_prefetch_reads_ahead_in_order_with_bounded_depth(self):
+        """Ensure prefetched results come back in order, never more than depth ahead of the consumer."""
+        consumed = []
+        ahead = []
+
+        def load(item, metrics):
+            ahead.append(item - len(consumed))
+            with metrics.stage("load"):
+                metrics.count("documents")
+            return item * 2
+
+        metrics = PipelineMetrics()
+        for result in iter_prefetched(load, range(20), depth=3, metrics=metrics):
+            consumed.append(result)
+        self.assertEqual(consumed, [item * 2 for item in range(20)])
+        self.assertLessEqual(max(ahead), 3)
+        self.assertEqual(metrics.counters["documents"], 20)
+        self.assertEqual(metrics.calls["load"], 20)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 6)
+            sequential = dict(iter_quizzes_for_files(file_paths, num_questions=3, seed=2, prefetch=0))
+            cache = DocumentCache(os.path.join(tmp_dir, "cache"))
+            prefetched = dict(iter_quizzes_for_files(file_paths, num_questions=3, seed=2, cache=cache, prefetch=4))
+            self.assertEqual(prefetched, sequential)
+            self.assertEqual(cache.misses, 6)
+
+            # Mid-stream, only the second pass's loader threads are alive
+            quizzes = iter_quizzes_for_files(file_paths, num_questions=3, seed=2, prefetch=2)
+            next(quizzes)
+            loaders = [thread for thread in threading.enumerate() if thread.name.startswith("prefetch")]
+            self.assertLessEqual(len(loaders), 2)
+            quizzes.close()
+
+            # Worker processes are forked before any loader thread starts
+            alive_at_fork, recording = [], [True]
+
+            def before_fork():
+                if recording:
+                    alive_at_fork.extend(t.name for t in threading.enumerate() if t.name.startswith("prefetch"))
+
+            os.register_at_fork(before=before_fork)
+            try:
+                parallel = dict(iter_quizzes_for_files(file_paths, num_questions=3, seed=2, workers=2, prefetch=2))
+            finally:
+                recording.clear()
+            self.assertEqual(parallel, sequential)
+            self.assertEqual(alive_at_fork, [])
+
+    def test_quiz_engine_matches_batch_generation(self):
+        """Ensure the resident engine answers from memory with the same quizzes as a batch run."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._write_chapters(tmp_dir, 3)
+
+            engine = QuizEngine(input_dir=tmp_dir)
+            self.assertEqual(engine.files, ["chapter0.txt", "chapter1.txt", "chapter2.txt"])
+
+            batch = generate_quizzes_for_files(discover_test_bank_files(tmp_dir), num_questions=4, seed=9)
+            for file_name in engine.files:
+                self.assertEqual(engine.generate(file_name, 4, derive_file_seed(9, file_name)), batch[file_name])
+            self.assertEqual(engine.generate("chapter0.txt", 4, seed=1), engine.generate("chapter0.txt", 4, seed=1))
+            with self.assertRaises(KeyError):
+                engine.generate("missing.txt", 4)
+
+            # Phrase terms overlap their words, which must not make the engine's wider index differ
+            vocabulary = VocabularyOptions(ngram_range=(1, 2))
+            engine = QuizEngine(input_dir=tmp_dir, vocabulary=vocabulary)
+            batch = generate_quizzes_for_files(discover_test_bank_files(tmp_dir), num_questions=4, seed=9,
+                                               vocabulary=vocabulary)
+            for file_name in engine.files:
+                self.assertEqual(engine.generate(file_name, 4, derive_file_seed(9, file_name)), batch[file_name])
+
+    def test_pipeline_metrics_time_stages_and_count_work(self):
+        """Ensure a run reports every stage, its counters and each finished stage to callbacks."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "arrays.txt")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(self.sample_text)
+
+            finished = []
+            metrics = PipelineMetrics(callbacks=[lambda stage, seconds, _: finished.append(stage)])
+            quizzes = iter_quizzes_for_files([file_path], num_questions=3, seed=1, metrics=metrics)
+            export_quiz_stream(quizzes, os.path.join(tmp_dir, "out"), "txt", metrics)
+
+            self.assertEqual(set(finished), set(generate_quiz.STAGES))
+            counters = metrics.counters
+            self.assertEqual(counters["documents"], 1)
+            self.assertEqual(counters["bytes_read"], len(self.sample_text.encode("utf-8")))
+            self.assertEqual(counters["sentences"], len(self.sample_text.split(". ")))
+            self.assertGreater(counters["vocabulary_size"], 0)
+            self.assertEqual(counters["statements"], 3)
+            self.assertGreater(counters["attempts"], 0)
+            self.assertIn("Statements per second", metrics.summary())
+
+            merged = PipelineMetrics()
+            merged.merge(metrics.snapshot())
+            merged.merge(metrics.snapshot())
+            self.assertEqual(merged.counters["statements"], 6)
+            self.assertEqual(merged.calls["export"], 2 * metrics.calls["export"])
+
+    def test_debug_logging_is_lazy(self):
+        """Ensure debug messages are not formatted unless debug logging is enabled."""
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError("formatted while debug logging is disabled")
+
+            __repr__ = __str__
+
+        level = generate_quiz.logger.level
+        generate_quiz.logger.setLevel("WARNING")
+        try:
+            generate_quiz.logger.debug("TF-IDF Terms: %s", Unformattable())
+        finally:
+            generate_quiz.logger.setLevel(level)
+        with self.assertLogs("generate_quiz", level="DEBUG") as logs:
+            select_quiz_terms(self.tfidf_scores, n_terms=2, variation=2)
+        self.assertTrue(logs.output)
+
+    def test_quiz_variants_are_distinct_and_reproducible(self):
+        """Ensure one call draws many different quizzes per file, reproducibly and within the overlap limit."""
+        import itertools
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = self._write_chapters(tmp_dir, 2)
+
+            variants = generate_quiz_variants_for_files(file_paths, num_variants=20, num_questions=3, seed=4)
+            self.assertEqual(list(variants), ["chapter0.txt", "chapter1.txt"])
+            self.assertEqual(variants, generate_quiz_variants_for_files(file_paths, 20, 3, seed=4))
+            quizzes = variants["chapter0.txt"]
+            self.assertEqual([len(quiz) for quiz in quizzes], [3] * 20)
+            self.assertGreater(len({tuple(quiz) for quiz in quizzes}), 10)
+            for quiz in quizzes:
+                self.assertEqual(len({statement for statement, _ in quiz}), 3)
+                for statement, is_true in quiz:
+                    self.assertEqual(is_true, statement in self.sample_text + " Chapter 0 covers topic0 in depth.")
+
+            engine = QuizEngine(file_paths)
+            limited = engine.generate_variants("chapter0.txt", 4, num_questions=3, seed=4, max_overlap=0)
+            for first, second in itertools.combinations(limited, 2):
+                self.assertFalse({statement.lower() for statement, _ in first}
+                                 & {statement.lower() for statement, _ in second})
+
+    def test_import_does_not_load_sklearn_or_write_files(self):
+        """Ensure importing the module is side-effect free and defers heavy imports."""
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = subprocess.run(
+                [sys.executable, "-c", "import sys, generate_quiz; print('sklearn' in sys.modules)"],
+                cwd=tmp_dir, env={**os.environ, "PYTHONPATH": repo_dir},
+                capture_output=True, text=True, check=True,
+            )
+            self.assertEqual(result.stdout.strip(), "False")
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_main_exports_json_quizzes(self):
+        """Ensure the CLI entry point honours input directory, question count and output format."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "arrays.txt"), "w", encoding="utf-8") as file:
+                file.write(self.sample_text)
+
+            output_dir = os.path.join(tmp_dir, "out")
+            with_answers_file, without_answers_file = main([
+                "arrays.txt", "--input-dir", tmp_dir, "--num-questions", "3",
+                "--format", "json", "--output-dir", output_dir, "--model-path", "",
+                "--cache-dir", os.path.join(tmp_dir, "cache"),
+            ])
+
+            with open(with_answers_file) as file:
+                with_answers = json.load(file)
+            with open(without_answers_file) as file:
+                without_answers = json.load(file)
+            self.assertEqual(len(with_answers["arrays.txt"]), 3)
+            self.assertIn("answer", with_answers["arrays.txt"][0])
+            self.assertNotIn("answer", without_answers["arrays.txt"][0])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from http import HTTPStatus
+
+from generate_quiz import QuizEngine
+from quiz_server import handle_request, start_server
+
+SAMPLE_TEXT = (
+    "Arrays are a fundamental data structure. "
+    "Arrays allow efficient access to elements using an index. "
+    "Dynamic arrays can resize automatically as elements are added or removed. "
+    "Stacks and queues are often implemented using arrays. "
+    "Elements in an array are accessed using their zero-based index."
+)
+
+
+class TestQuizServer(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls.tmp_dir.name, "arrays.txt"), "w", encoding="utf-8") as file:
+            file.write(SAMPLE_TEXT)
+        cls.engine = QuizEngine(input_dir=cls.tmp_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_handle_request_routes(self):
+        """Ensure each route returns the expected status."""
+        self.assertEqual(handle_request(self.engine, "GET", "/files"), (HTTPStatus.OK, {"files": ["arrays.txt"]}))
+        status, body = handle_request(self.engine, "GET", "/quiz?file=arrays.txt&num_questions=2&seed=3&answers=0")
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(len(body["statements"]), 2)
+        self.assertNotIn("answer", body["statements"][0])
+        self.assertEqual(handle_request(self.engine, "GET", "/quiz?file=missing.txt")[0], HTTPStatus.NOT_FOUND)
+        self.assertEqual(handle_request(self.engine, "GET", "/quiz?file=arrays.txt&seed=x")[0], HTTPStatus.BAD_REQUEST)
+        self.assertEqual(handle_request(self.engine, "POST", "/quiz")[0], HTTPStatus.METHOD_NOT_ALLOWED)
+        self.assertEqual(handle_request(self.engine, "GET", "/metrics")[0], HTTPStatus.OK)
+
+    async def test_concurrent_keep_alive_clients(self):
+        """Ensure many clients can request quizzes concurrently over kept-alive connections."""
+        server = await start_server(self.engine, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def client(seed):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            bodies = []
+            for request_seed in (seed, seed):
+                writer.write(f"GET /quiz?file=arrays.txt&num_questions=3&seed={request_seed} HTTP/1.1\r\n"
+                             f"Host: localhost\r\n\r\n".encode())
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.assertTrue(head.startswith(b"HTTP/1.1 200 OK"))
+                length = int(next(line.split(b":")[1] for line in head.split(b"\r\n")
+                                  if line.lower().startswith(b"content-length")))
+                bodies.append(json.loads(await reader.readexactly(length)))
+            writer.close()
+            await writer.wait_closed()
+            return bodies
+
+        async with server:
+            results = await asyncio.gather(*(client(seed) for seed in range(20)))
+
+        for first, second in results:
+            self.assertEqual(first, second, "The same seed should always give the same quiz.")
+            self.assertEqual(len(first["statements"]), 3)
+
+    async def test_malformed_content_length_is_rejected(self):
+        """Ensure a bad or oversized Content-Length gets an error response instead of a dropped connection."""
+        server = await start_server(self.engine, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def status_line(content_length):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET /health HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode())
+            await writer.drain()
+            line = await reader.readline()
+            writer.close()
+            await writer.wait_closed()
+            return line
+
+        async with server:
+            self.assertTrue((await status_line("abc")).startswith(b"HTTP/1.1 400"))
+            self.assertTrue((await status_line("-5")).startswith(b"HTTP/1.1 400"))
+            self.assertTrue((await status_line(10 ** 9)).startswith(b"HTTP/1.1 413"))
+
+
+if __name__ == "__main__":
+    unittest.main()
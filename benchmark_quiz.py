@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+
+import generate_quiz
+
+# Pipeline stages, in the order they run
+STAGES = [
+    'load_text',
+    'calculate_tfidf',
+    'select_quiz_terms',
+    'generate_true_false_statements',
+    'export_quizzes_to_files',
+]
+
+# Named sets of (total corpus size, number of files) scales
+PRESETS = {
+    'quick': ['1KB:1', '100KB:10', '1MB:100'],
+    'full': ['1KB:1', '1MB:10', '10MB:100', '100MB:1', '100MB:1000', '300MB:10', '50MB:10000'],
+}
+
+# A stage only counts as a regression if it is this much slower in absolute terms,
+# so timer noise on sub-millisecond stages does not fail a comparison.
+MIN_REGRESSION_SECONDS = 0.005
+
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# Terms the synthetic text is built around, so TF-IDF has something to find
+TOPIC_WORDS = [
+    'array', 'arrays', 'index', 'element', 'elements', 'memory', 'pointer', 'stack', 'queue',
+    'list', 'linked', 'node', 'tree', 'graph', 'hash', 'table', 'heap', 'sorting', 'searching',
+    'insertion', 'deletion', 'traversal', 'recursion', 'complexity', 'algorithm', 'binary',
+    'dynamic', 'static', 'capacity', 'contiguous', 'allocation', 'structure', 'operation',
+]
+FILLER_WORDS = ['the', 'a', 'is', 'are', 'of', 'in', 'to', 'and', 'with', 'for', 'each', 'can', 'be', 'used']
+
+
+def parse_size(size):
+    """
+    Parses a human-readable size such as "1KB", "1.5MB" or "300MB".
+
+    Args:
+        size (str): The size to parse.
+
+    Returns:
+        int: The size in bytes.
+    """
+    size = size.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(size)
+
+
+def parse_scale(scale):
+    """
+    Parses a "SIZE:FILES" scale such as "100MB:1000".
+
+    Args:
+        scale (str): The scale to parse.
+
+    Returns:
+        tuple: The total corpus size in bytes and the number of files.
+    """
+    size, _, file_count = scale.partition(':')
+    return parse_size(size), int(file_count or 1)
+
+
+def _make_vocabulary(rng, size=5000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = {''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)}
+    return TOPIC_WORDS + sorted(words)
+
+
+def make_synthetic_corpus(directory, total_bytes, file_count, seed=0):
+    """
+    Writes a seeded synthetic Test Bank of roughly total_bytes split over file_count files.
+
+    Sentences mix filler words with a Zipf-distributed vocabulary, so a few terms
+    dominate each chapter the way they do in real text.
+
+    Args:
+        directory (str): Directory the files are written to.
+        total_bytes (int): Approximate size of the whole corpus.
+        file_count (int): Number of files.
+        seed (int): Seed for the generated text. The same seed always gives the same corpus.
+
+    Returns:
+        list: Paths of the generated files.
+    """
+    rng = random.Random(seed)
+    vocabulary = _make_vocabulary(rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    file_bytes = max(1, total_bytes // file_count)
+
+    os.makedirs(directory, exist_ok=True)
+    file_paths = []
+    for i in range(file_count):
+        file_path = os.path.join(directory, f"chapter{i:05d}.txt")
+        # Every chapter favours its own slice of the vocabulary
+        offset = rng.randrange(len(vocabulary))
+        chapter_vocabulary = vocabulary[offset:] + vocabulary[:offset]
+        written = 0
+        with open(file_path, 'w', encoding='utf-8') as file:
+            while written < file_bytes:
+                lines = []
+                for _ in range(200):
+                    words = rng.choices(chapter_vocabulary, weights, k=rng.randint(5, 12))
+                    words += rng.choices(FILLER_WORDS, k=rng.randint(2, 6))
+                    rng.shuffle(words)
+                    lines.append(' '.join(words).capitalize() + '. ')
+                chunk = ''.join(lines)[:file_bytes - written]
+                file.write(chunk)
+                written += len(chunk)
+        file_paths.append(file_path)
+    return file_paths
+
+
+class _StageTimer:
+    # Records the wall-clock time and traced peak memory of one stage
+    def __init__(self, results, stage, trace_memory):
+        self.results = results
+        self.stage = stage
+        self.trace_memory = trace_memory
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        result = {'seconds': round(seconds, 6)}
+        if self.trace_memory:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - self.start_memory
+        self.results[self.stage] = result
+
+
+def run_benchmark(total_bytes, file_count, seed=0, num_questions=5, trace_memory=True):
+    """
+    Benchmarks every stage of the quiz pipeline on one synthetic corpus.
+
+    Args:
+        total_bytes (int): Approximate size of the whole corpus.
+        file_count (int): Number of files.
+        seed (int): Seed for the corpus and for quiz generation.
+        num_questions (int): Number of questions generated per file.
+        trace_memory (bool): Whether to record peak memory per stage with tracemalloc.
+            Tracing slows every stage down, so only compare runs made with the same setting.
+
+    Returns:
+        dict: The scale and, for every stage, its time in seconds and peak memory in bytes.
+    """
+    work_dir = tempfile.mkdtemp(prefix='quiz-benchmark-')
+    stages = {}
+    try:
+        file_paths = make_synthetic_corpus(os.path.join(work_dir, 'Test Bank'), total_bytes, file_count, seed)
+        file_names = [os.path.basename(file_path) for file_path in file_paths]
+        rng = random.Random(seed)
+
+        if trace_memory:
+            tracemalloc.start()
+
+        with _StageTimer(stages, 'load_text', trace_memory):
+            texts = [generate_quiz.load_text(file_path) for file_path in file_paths]
+
+        with _StageTimer(stages, 'calculate_tfidf', trace_memory):
+            vectorizer, tfidf_matrix = generate_quiz.fit_corpus_tfidf(texts)
+            feature_names = vectorizer.get_feature_names_out()
+
+        with _StageTimer(stages, 'select_quiz_terms', trace_memory):
+            all_quiz_terms = []
+            for row in range(len(texts)):
+                terms, scores = generate_quiz.tfidf_row_arrays(tfidf_matrix, row, feature_names)
+                all_quiz_terms.append(
+                    generate_quiz.select_top_quiz_terms(terms, scores, n_terms=10, variation=5, rng=rng)
+                )
+
+        with _StageTimer(stages, 'generate_true_false_statements', trace_memory):
+            quizzes = {}
+            for file_name, text, quiz_terms in zip(file_names, texts, all_quiz_terms):
+                quizzes[file_name] = generate_quiz.generate_true_false_statements(
+                    text, quiz_terms, num_questions, rng=rng,
+                )
+
+        with _StageTimer(stages, 'export_quizzes_to_files', trace_memory):
+            generate_quiz.export_quizzes_to_files(quizzes, os.path.join(work_dir, 'Quizzes'))
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'total_bytes': total_bytes, 'files': file_count, 'stages': stages}
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Compares benchmark results with a stored baseline.
+
+    Args:
+        results (dict): Results of the current run, as written by main().
+        baseline (dict): Results of the baseline run.
+        tolerance (float): Allowed relative slowdown (or memory growth) before a stage counts as a regression.
+
+    Returns:
+        list: One dict per regressed stage with the scale, stage, metric and both values.
+    """
+    baseline_runs = {(run['total_bytes'], run['files']): run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in results['runs']:
+        baseline_run = baseline_runs.get((run['total_bytes'], run['files']))
+        if baseline_run is None:
+            continue
+        for stage, measured in run['stages'].items():
+            expected = baseline_run['stages'].get(stage)
+            if expected is None:
+                continue
+            for metric in ('seconds', 'peak_bytes'):
+                if metric not in measured or metric not in expected:
+                    continue
+                limit = expected[metric] * (1 + tolerance)
+                if metric == 'seconds':
+                    limit = max(limit, expected[metric] + MIN_REGRESSION_SECONDS)
+                if measured[metric] > limit:
+                    regressions.append({
+                        'total_bytes': run['total_bytes'],
+                        'files': run['files'],
+                        'stage': stage,
+                        'metric': metric,
+                        'baseline': expected[metric],
+                        'current': measured[metric],
+                    })
+    return regressions
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def format_report(results):
+    """
+    Formats benchmark results as a table with one line per scale and stage.
+
+    Args:
+        results (dict): Results as written by main().
+
+    Returns:
+        str: The report.
+    """
+    lines = [f"{'scale':>18}  {'stage':<32}{'seconds':>10}{'peak memory':>14}"]
+    for run in results['runs']:
+        scale = f"{_format_bytes(run['total_bytes'])} x {run['files']}"
+        for stage in STAGES:
+            measured = run['stages'][stage]
+            peak = _format_bytes(measured['peak_bytes']) if 'peak_bytes' in measured else '-'
+            lines.append(f"{scale:>18}  {stage:<32}{measured['seconds']:>10.4f}{peak:>14}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments.
+
+    Args:
+        argv (list): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the quiz pipeline on synthetic corpora.")
+    parser.add_argument(
+        "--preset", choices=sorted(PRESETS), default="quick", help="Named set of scales to run (default: quick).",
+    )
+    parser.add_argument(
+        "--scale", action="append", dest="scales",
+        help='Corpus scale as SIZE:FILES, e.g. "100MB:1000". Repeatable; overrides --preset.',
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpora.")
+    parser.add_argument("-n", "--num-questions", type=int, default=5, help="Number of questions per file.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc peak-memory tracking.")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline (default: 0.2).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks, prints a report and optionally saves and compares the results.
+
+    Args:
+        argv (list): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: 1 if a regression against the baseline was found, 0 otherwise.
+    """
+    args = parse_args(argv)
+
+    # Import scikit-learn up front so its import time is not charged to the first TF-IDF stage
+    import sklearn.feature_extraction.text  # noqa: F401
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'num_questions': args.num_questions,
+        'trace_memory': not args.no_memory,
+        'runs': [],
+    }
+    for scale in args.scales or PRESETS[args.preset]:
+        total_bytes, file_count = parse_scale(scale)
+        results['runs'].append(
+            run_benchmark(total_bytes, file_count, args.seed, args.num_questions, trace_memory=not args.no_memory)
+        )
+
+    print(format_report(results))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"REGRESSION {_format_bytes(regression['total_bytes'])} x {regression['files']} "
+                f"{regression['stage']} {regression['metric']}: "
+                f"{regression['baseline']} -> {regression['current']}"
+            )
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
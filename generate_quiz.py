@@ -1,21 +1,289 @@
+import argparse
+import bisect
+import codecs
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import mmap
 import os
+import pickle
 import random
 import re
+import threading
+import time
 
+from array import array
+from dataclasses import dataclass
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
 
-DEBUG = True  # Set to True to enable all debugging messages
+# scikit-learn and joblib are imported inside the functions that need them, so
+# importing this module (or running --help) stays fast.
 
-def debug_print(message):
+logger = logging.getLogger(__name__)
+
+# Base directory for text bank
+TEST_BANK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Test Bank')
+
+# Where quizzes, the saved corpus TF-IDF model and cached document artifacts are written
+QUIZZES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Quizzes')
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.quiz_cache', 'tfidf_model.joblib')
+DOCUMENT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.quiz_cache', 'documents')
+
+# Default size limit of the document cache; least recently used entries are evicted beyond it
+DOCUMENT_CACHE_BYTES = 512 * 1024 * 1024
+
+# Version of the cached DocumentArtifacts format
+ARTIFACTS_VERSION = 3
+
+# Number of generated quizzes a QuizMemo keeps in memory
+QUIZ_MEMO_SIZE = 1024
+
+# Term selection settings used when generating quizzes for files
+N_QUIZ_TERMS = 10
+TERM_VARIATION = 5
+
+# False statements pick their replacement among this many of the most similar terms
+DISTRACTOR_CHOICES = 3
+
+OUTPUT_FORMATS = ('txt', 'json', 'jsonl', 'csv')
+
+# Encodings tried, in order, when decoding a Test Bank file
+ENCODINGS = ['utf-8', 'utf-8-sig', 'latin1', 'ISO-8859-1']
+
+# Files at least this large are memory-mapped instead of read into a bytes object
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Chunked mode: window size in characters, and the most distinct terms counted per document
+# (less frequent terms are pruned beyond it)
+CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_MAX_TERMS = 100_000
+
+# Chunked mode keeps at most this many candidate sentences per quiz term
+SENTENCE_RESERVOIR_SIZE = 32
+
+# Number of upcoming files read ahead on background threads while the current one is processed
+PREFETCH_DEPTH = 4
+
+# Pipeline stages in the order they run, for the metrics summary
+STAGES = ('load', 'tfidf', 'select_terms', 'generate_statements', 'export')
+
+
+# Per-stage timers and counters
+class PipelineMetrics:
+    """
+    Collects per-stage timings and counters of a quiz generation run.
+
+    Stages are timed with stage(); counters such as bytes_read, sentences,
+    vocabulary_size, attempts and statements are added with count(). Every
+    callback is called as callback(stage, seconds, metrics) each time a stage
+    finishes, and summary() formats a report for the end of the run.
+    """
+
+    def __init__(self, callbacks=()):
+        self.timers = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+        self.callbacks = list(callbacks)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Times a block of code as one call of the named stage.
+
+        Args:
+            name (str): The stage, usually one of STAGES.
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def _record(self, name, seconds):
+        self.timers[name] += seconds
+        self.calls[name] += 1
+        for callback in self.callbacks:
+            callback(name, seconds, self)
+
+    def count(self, name, value=1):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): The counter.
+            value (int): The amount to add.
+        """
+        self.counters[name] += value
+
+    def snapshot(self):
+        """
+        Returns the timers, call counts and counters as plain dictionaries.
+        """
+        return {'timers': dict(self.timers), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def merge(self, snapshot):
+        """
+        Adds the metrics of a snapshot, such as one returned by a worker process.
+
+        Callbacks are called once for every stage in the snapshot, with its total time.
+
+        Args:
+            snapshot (dict): A snapshot from another PipelineMetrics.
+        """
+        for name, seconds in snapshot['timers'].items():
+            self.timers[name] += seconds
+            self.calls[name] += snapshot['calls'].get(name, 0)
+            for callback in self.callbacks:
+                callback(name, seconds, self)
+        self.counters.update(snapshot['counters'])
+
+    def summary(self):
+        """
+        Formats a report of where the time went, the counters and the statement throughput.
+
+        Returns:
+            str: The report.
+        """
+        total = sum(self.timers.values()) or 1.0
+        ordered = [name for name in STAGES if name in self.timers]
+        ordered += sorted(name for name in self.timers if name not in STAGES)
+
+        lines = [f"{'Stage':<22}{'Time (s)':>10}{'Share':>8}{'Calls':>8}"]
+        for name in ordered:
+            seconds = self.timers[name]
+            lines.append(f"{name:<22}{seconds:>10.4f}{seconds / total:>8.1%}{self.calls[name]:>8}")
+        if self.counters:
+            lines.append("Counters:")
+            lines.extend(f"  {name}: {value}" for name, value in sorted(self.counters.items()))
+        if self.timers.get('generate_statements'):
+            rate = self.counters['statements'] / self.timers['generate_statements']
+            lines.append(f"Statements per second: {rate:.1f}")
+        return '\n'.join(lines)
+
+
+class _NullMetrics(PipelineMetrics):
+    # Used when no metrics are requested, so callers never need to check for None
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield self
+
+    def count(self, name, value=1):
+        pass
+
+    def merge(self, snapshot):
+        pass
+
+
+def _metrics_or_null(metrics):
+    return metrics if metrics is not None else _NullMetrics()
+
+
+@dataclass
+class Document:
+    """
+    A loaded Test Bank file.
+
+    Attributes:
+        path (str): Path to the text file.
+        text (str): The decoded text.
+        encoding (str): The encoding the text was decoded with.
+        digest (str): SHA-256 hex digest of the raw file contents.
+    """
+    path: str
+    text: str
+    encoding: str
+    digest: str
+
+    @functools.cached_property
+    def tokens(self):
+        """set: Tokenized terms from preprocess_text_for_matching, computed on first use."""
+        return preprocess_text_for_matching(self.text)
+
+
+def _decode(data, encodings):
+    for encoding in encodings:
+        try:
+            return str(data, encoding), encoding
+        except UnicodeDecodeError:
+            continue
+
+    raise ValueError("Unable to read the file with the tried encodings.")
+
+
+# Load and preprocess a document
+def load_document(file_path, metrics=None):
+    """
+    Loads a file once as bytes and decodes it in memory, trying multiple encodings.
+
+    Large files are memory-mapped rather than copied into a bytes object.
+
+    Args:
+        file_path (str): Path to the text file.
+        metrics (PipelineMetrics): Receives the bytes_read counter.
+
+    Returns:
+        Document: The decoded text with its encoding and digest.
+
+    Raises:
+        ValueError: If the file cannot be read with the specified encodings.
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        _metrics_or_null(metrics).count('bytes_read', size)
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest = hashlib.sha256(data).hexdigest()
+                text, encoding = _decode(data, ENCODINGS)
+        else:
+            data = file.read()
+            digest = hashlib.sha256(data).hexdigest()
+            text, encoding = _decode(data, ENCODINGS)
+
+    # Match the newline translation of files opened in text mode
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    return Document(file_path, text, encoding, digest)
+
+
+# Find every text file in the Test Bank
+def discover_test_bank_files(input_dir):
     """
-    Prints a debugging message if DEBUG is enabled.
+    Finds every .txt file under a directory, including its subdirectories.
+
+    Quizzes are keyed by file name, so files in different subdirectories must still
+    have distinct names; the quiz functions raise ValueError otherwise.
 
     Args:
-        message (str): The message to print.
+        input_dir (str): The Test Bank directory.
+
+    Returns:
+        list: Paths of the text files, sorted so runs process them in a stable order.
     """
-    if DEBUG:
-        print(message)
+    file_paths = []
+    for dir_path, dir_names, file_names in os.walk(input_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith('.txt'):
+                file_paths.append(os.path.join(dir_path, file_name))
+    return file_paths
+
+
+def _file_names(file_paths):
+    # Quizzes, derived seeds and the corpus fingerprint are keyed by file name, so a
+    # second file with the same name would silently replace the first
+    file_names = [os.path.basename(file_path) for file_path in file_paths]
+    duplicates = sorted(name for name, count in collections.Counter(file_names).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Files must have distinct names; found several named: {', '.join(duplicates)}")
+    return file_names
 
 
 # Load and preprocess the text
@@ -32,22 +300,72 @@ def load_text(file_path):
     Raises:
         ValueError: If the file cannot be read with the specified encodings.
     """
-    encodings = ['utf-8', 'utf-8-sig', 'latin1', 'ISO-8859-1']
-    text = None
+    return load_document(file_path).text
 
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                text = file.read()
-            break
-        except UnicodeDecodeError:
-            continue
 
-    if text is None:
-        raise ValueError("Unable to read the file with the tried encodings.")
+def _iter_decoded_blocks(file_path, encoding, block_size, digest=None, metrics=None):
+    # Decodes the file block by block, with newlines normalized like load_document
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending_cr = ''
+    with open(file_path, 'rb') as file:
+        while True:
+            data = file.read(block_size)
+            if digest is not None:
+                digest.update(data)
+            _metrics_or_null(metrics).count('bytes_read', len(data))
+            text = pending_cr + decoder.decode(data, final=not data)
+            # A '\r' at the end of a block may be the first half of a '\r\n'
+            pending_cr = '\r' if data and text.endswith('\r') else ''
+            if pending_cr:
+                text = text[:-1]
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            yield text
+            if not data:
+                return
+
 
-    preprocess_text_for_matching(text)
-    return text
+# Stream a large document in sentence-aligned windows
+def iter_document_chunks(file_path, encoding='utf-8', chunk_size=CHUNK_SIZE, digest=None, metrics=None):
+    """
+    Streams a document as windows of about chunk_size characters that end at sentence boundaries.
+
+    Only one window and the sentence it cut short are held in memory at a time. A
+    sentence longer than a whole window is cut at its last space.
+
+    Args:
+        file_path (str): Path to the text file.
+        encoding (str): The encoding to decode the file with.
+        chunk_size (int): The target window size, in characters.
+        digest (hashlib.sha256): Updated with the raw file contents, if given.
+        metrics (PipelineMetrics): Receives the bytes_read counter.
+
+    Yields:
+        str: The windows of decoded text, in order.
+
+    Raises:
+        UnicodeDecodeError: If the file cannot be decoded with the encoding.
+    """
+    carry = ''
+    for text in _iter_decoded_blocks(file_path, encoding, chunk_size, digest, metrics):
+        if not text:
+            continue
+        window = carry + text
+        # Hold back the text after the last boundary, it may continue in the next block.
+        # Line breaks always end a sentence and are cheap to find.
+        cut = window.rfind('\n') + 1
+        if not cut:
+            last_sentence = None
+            for last_sentence in _SENTENCE.finditer(window):
+                pass
+            cut = last_sentence.start() if last_sentence is not None else 0
+        if not cut and len(window) >= chunk_size:
+            cut = max(window.rfind(' '), window.rfind('\t')) + 1 or len(window)
+        if cut:
+            yield window[:cut]
+        carry = window[cut:]
+    if carry.strip():
+        yield carry
 
 
 # Clean up text
@@ -67,194 +385,2277 @@ def preprocess_text_for_matching(text):
     return set(text.split())
 
 
+@dataclass(frozen=True)
+class VocabularyOptions:
+    """
+    How the TF-IDF vocabulary is built, for phrase terms and a bounded vocabulary.
+
+    The defaults match the default vocabulary: every word of two or more characters
+    that is not an English stop word.
+
+    Attributes:
+        ngram_range (tuple): The (min_n, max_n) lengths of the terms, in words. A phrase only
+            joins words separated by a single space with no stop word among them, so every
+            phrase occurs verbatim in the text, as in "linked list" or "binary search". min_n must be
+            at least 1 and no more than max_n, or ValueError is raised.
+        min_df (int or float): Terms found in fewer documents are dropped. A float is a
+            proportion of the documents.
+        max_df (int or float): Terms found in more documents are dropped. A float is a
+            proportion of the documents.
+        max_features (int): If given, only this many terms are kept, the most frequent in the corpus.
+    """
+    ngram_range: tuple = (1, 1)
+    min_df: float = 1
+    max_df: float = 1.0
+    max_features: int = None
+
+    def __post_init__(self):
+        min_n, max_n = self.ngram_range
+        if not 1 <= min_n <= max_n:
+            raise ValueError(f"ngram_range must have 1 <= min_n <= max_n, got {self.ngram_range}")
+
+
+# Scores of one document's terms, without a dictionary per document
+class TermScores(collections.abc.Mapping):
+    """
+    Read-only mapping of terms to TF-IDF scores, stored as two parallel arrays.
+
+    Terms are kept sorted, as in the model's vocabulary, and looked up by binary
+    search, so no hash table is built. The term strings are the vocabulary's own
+    objects, referenced rather than copied, and scores are a float array rather than
+    one Python float per term.
+    """
+
+    __slots__ = ('terms', 'scores')
+
+    def __init__(self, terms=(), scores=()):
+        """
+        Args:
+            terms (numpy.ndarray): The terms. They are sorted if they are not already.
+            scores (numpy.ndarray): The TF-IDF score of each term.
+        """
+        import numpy as np
+
+        terms = np.asarray(terms, dtype=object)
+        scores = np.array(scores, dtype=float)
+        if len(terms) > 1 and not (terms[:-1] <= terms[1:]).all():
+            order = np.argsort(terms, kind='stable')
+            terms, scores = terms[order], scores[order]
+        self.terms = terms
+        self.scores = scores
+
+    def __getitem__(self, term):
+        import numpy as np
+
+        try:
+            position = int(np.searchsorted(self.terms, term))
+        except TypeError:
+            raise KeyError(term) from None
+        if position == len(self.terms) or self.terms[position] != term:
+            raise KeyError(term)
+        return float(self.scores[position])
+
+    def __iter__(self):
+        return iter(self.terms.tolist())
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __repr__(self):
+        return f"TermScores({len(self)} terms)"
+
+
 # Calculate TF-IDF
-def calculate_tfidf(text):
+def calculate_tfidf(text, vocabulary=None):
     """
     Calculates TF-IDF scores for each term in the provided text.
 
     Args:
         text (str): The input text to analyze.
+        vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits. If None, every
+            single word but stop words is scored.
 
     Returns:
-        dict: A dictionary where keys are terms and values are TF-IDF scores.
+        TermScores: A mapping where keys are terms and values are TF-IDF scores.
     """
     if not text.strip():
-        return {}
+        return TermScores()
+
+    vectorizer, tfidf_matrix = fit_corpus_tfidf([text], vocabulary)
+    if vectorizer is None:
+        return TermScores()
+
+    tfidf_scores = tfidf_scores_from_row(tfidf_matrix, 0, vectorizer.get_feature_names_out())
+    logger.debug("TF-IDF vocabulary size: %d", len(tfidf_scores))
+    return tfidf_scores
+
+
+_TOKEN = re.compile(r'(?u)\b\w\w+\b')  # The default token_pattern of scikit-learn's vectorizers
+
+
+def _phrase_terms(text, ngram_range):
+    # Terms of ngram_range words, lowercased, from runs of non-stop words separated by single spaces
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    min_n, max_n = ngram_range
+    text = text.lower()
+    terms = []
+    run = []
+    previous_end = None
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        if token in ENGLISH_STOP_WORDS:
+            run = []
+            continue
+        if previous_end is None or text[previous_end:match.start()] != ' ':
+            run = []
+        run.append(token)
+        del run[:-max_n]
+        for n in range(min_n, len(run) + 1):
+            terms.append(' '.join(run[-n:]))
+        previous_end = match.end()
+    return terms
+
+
+def _tfidf_vectorizer(vocabulary=None):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if vocabulary is None:
+        return TfidfVectorizer(stop_words='english')
+    if tuple(vocabulary.ngram_range) == (1, 1):
+        options = {'stop_words': 'english'}
+    else:
+        options = {'analyzer': _term_analyzer(tuple(vocabulary.ngram_range))}
+    return TfidfVectorizer(
+        min_df=vocabulary.min_df, max_df=vocabulary.max_df, max_features=vocabulary.max_features, **options,
+    )
+
+
+# Fit one TF-IDF model over the whole corpus
+def fit_corpus_tfidf(texts, vocabulary=None):
+    """
+    Fits a single TF-IDF model over every document in the corpus.
+
+    Args:
+        texts (list): The document texts, one per file.
+        vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits.
 
-    vectorizer = TfidfVectorizer(stop_words='english')
+    Returns:
+        tuple: The fitted vectorizer and a sparse matrix with one row per document,
+        or (None, None) if the corpus has no usable vocabulary.
+    """
+    vectorizer = _tfidf_vectorizer(vocabulary)
     try:
-        tfidf_matrix = vectorizer.fit_transform([text])
-        tfidf_scores = dict(zip(vectorizer.get_feature_names_out(), tfidf_matrix.toarray()[0]))
-        debug_print(f"TF-IDF Terms: {tfidf_scores.keys()}")
-        return tfidf_scores
+        tfidf_matrix = vectorizer.fit_transform(texts)
     except ValueError as e:
-        debug_print(f"Error calculating TF-IDF: {e}")
-        return {}
+        logger.warning("Error calculating TF-IDF: %s", e)
+        return None, None
 
+    return vectorizer, tfidf_matrix
 
-# Select key terms for quiz with varied ranking to avoid repetition
-def select_quiz_terms(tfidf_scores, n_terms=5, variation=10, guaranteed_terms=None):
+
+@functools.lru_cache(maxsize=None)
+def _term_analyzer(ngram_range=(1, 1)):
+    if ngram_range == (1, 1):
+        return _tfidf_vectorizer().build_analyzer()
+    return functools.partial(_phrase_terms, ngram_range=ngram_range)
+
+
+def _ngram_range(vocabulary):
+    return (1, 1) if vocabulary is None else tuple(vocabulary.ngram_range)
+
+
+# Count the terms of one document, so the corpus can be refitted without re-reading it
+def count_terms(text, vocabulary=None):
     """
-    Selects key terms for quiz questions by varying the ranking of terms to increase variety.
+    Counts the terms of a document the way the TF-IDF vectorizer tokenizes it.
+
     Args:
-        tfidf_scores (dict): Dictionary of terms with their TF-IDF scores.
-        n_terms (int): Number of terms to select for the quiz.
-        variation (int): The variation in term selection to prevent repetition.
-        guaranteed_terms (list): Terms that must be included if present in the TF-IDF scores.
+        text (str): The document text.
+        vocabulary (VocabularyOptions): Its ngram_range sets the lengths of the counted terms.
+
     Returns:
-        list: A list of selected terms for generating quiz questions.
+        dict: A dictionary where keys are terms and values are their number of occurrences.
+    """
+    return dict(collections.Counter(_term_analyzer(_ngram_range(vocabulary))(text)))
+
+
+def _vocabulary_support(counts, vocabulary):
+    # Mask of the columns kept by the document-frequency bounds and the feature limit,
+    # with the semantics of scikit-learn's vectorizers
+    import numpy as np
+
+    num_documents = counts.shape[0]
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    min_count = vocabulary.min_df if isinstance(vocabulary.min_df, int) else vocabulary.min_df * num_documents
+    max_count = vocabulary.max_df if isinstance(vocabulary.max_df, int) else vocabulary.max_df * num_documents
+    support = (document_frequency >= min_count) & (document_frequency <= max_count)
+
+    if vocabulary.max_features is not None and support.sum() > vocabulary.max_features:
+        frequency = np.asarray(counts.sum(axis=0)).ravel()
+        kept = np.flatnonzero(support)
+        kept = kept[np.argsort(-frequency[kept], kind='stable')[:vocabulary.max_features]]
+        support = np.zeros_like(support)
+        support[kept] = True
+    return support
+
+
+def fit_corpus_tfidf_from_counts(term_counts, vocabulary=None):
+    """
+    Fits the corpus TF-IDF model from per-document term counts.
+
+    This gives the same scores as fit_corpus_tfidf on the texts, but only needs the
+    counts, which are cached per document. Refitting after one chapter changes
+    therefore does not re-tokenize the rest of the Test Bank.
+
+    Args:
+        term_counts (list): One dictionary of term counts per document, from count_terms.
+        vocabulary (VocabularyOptions): If given, terms outside its document-frequency bounds
+            are dropped and at most max_features terms are kept.
+
+    Returns:
+        tuple: The fitted model (with get_feature_names_out) and a sparse matrix with one
+        row per document, or (None, None) if the corpus has no vocabulary.
+    """
+    from sklearn.feature_extraction import DictVectorizer
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn.pipeline import Pipeline
+
+    if not any(term_counts):
+        logger.warning("Error calculating TF-IDF: empty vocabulary")
+        return None, None
+
+    if vocabulary is None:
+        model = Pipeline([('counts', DictVectorizer()), ('tfidf', TfidfTransformer())])
+        return model, model.fit_transform(term_counts).tocsr()
+
+    vectorizer = DictVectorizer()
+    counts = vectorizer.fit_transform(term_counts).tocsr()
+    support = _vocabulary_support(counts, vocabulary)
+    if not support.any():
+        logger.warning("Error calculating TF-IDF: no terms remain after vocabulary pruning")
+        return None, None
+    vectorizer.restrict(support)
+    transformer = TfidfTransformer()
+    tfidf_matrix = transformer.fit_transform(counts[:, support]).tocsr()
+    return Pipeline([('counts', vectorizer), ('tfidf', transformer)]), tfidf_matrix
+
+
+# Fingerprint the corpus so a saved model can be reused
+def corpus_fingerprint(file_names, texts):
+    """
+    Computes a fingerprint of the corpus contents.
+
+    Args:
+        file_names (list): Names of the documents in the corpus.
+        texts (list): The document texts, in the same order as file_names.
+
+    Returns:
+        str: A hex digest that changes whenever a document is added, removed or edited.
     """
-    sorted_terms = sorted(
-        tfidf_scores.items(), key=lambda item: item[1], reverse=True
+    return corpus_fingerprint_from_digests(
+        file_names, (hashlib.sha256(text.encode('utf-8')).hexdigest() for text in texts),
     )
-    selected_terms = []
-    used_terms = set()
 
-    # Ensure guaranteed terms are included
-    if guaranteed_terms:
-        for term in guaranteed_terms:
-            if term in tfidf_scores and term not in used_terms:
-                selected_terms.append(term)
-                used_terms.add(term)
 
-    # Randomly select additional terms
-    i = 0
-    while len(selected_terms) < n_terms and i < len(sorted_terms):
-        term, score = sorted_terms[i]
-        if term not in used_terms:
-            selected_terms.append(term)
-            used_terms.add(term)
-        i += random.randint(1, variation)  # Skip ahead by a random number for variety
+def corpus_fingerprint_from_digests(file_names, digests):
+    """
+    Computes a fingerprint of the corpus from the content digest of each document.
 
-    debug_print(f"Selected Quiz Terms: {selected_terms}")
-    return selected_terms
+    Args:
+        file_names (list): Names of the documents in the corpus.
+        digests (list): Hex digest of each document's contents, in the same order as file_names.
+
+    Returns:
+        str: A hex digest that changes whenever a document is added, removed or edited.
+    """
+    fingerprint = hashlib.sha256()
+    for file_name, digest in zip(file_names, digests):
+        fingerprint.update(file_name.encode('utf-8'))
+        fingerprint.update(bytes.fromhex(digest))
+    return fingerprint.hexdigest()
 
 
-# Generate True/False statements, avoiding duplicates
-def generate_true_false_statements(text, quiz_terms, num_questions, max_attempts=100):
-    sentences = text.split('. ')
-    if not isinstance(sentences, list) or not sentences:
-        debug_print("Invalid or empty sentences. Returning no statements.")
-        return []
+def _vocabulary_fingerprint(fingerprint, vocabulary):
+    # Models, cached quiz terms and memoized quizzes differ between vocabularies
+    if vocabulary is None:
+        return fingerprint
+    return hashlib.sha256(f"{fingerprint}:{vocabulary!r}".encode('utf-8')).hexdigest()
 
-    max_possible_statements = len(sentences) * len(quiz_terms)
-    num_questions = min(num_questions, max_possible_statements)  # Cap questions to maximum possible
-    debug_print(f"Max possible statements: {max_possible_statements}")
 
-    statements = []
-    used_combinations = set()
-    used_statements = set()
-    attempts = 0
+def _load_saved_model(model_path, fingerprint):
+    import joblib
 
-    while len(statements) < num_questions and attempts < max_attempts:
-        random.shuffle(quiz_terms)
-        for term in quiz_terms:
-            random.shuffle(sentences)
-            for sentence in sentences:
-                if term in sentence and (sentence, term) not in used_combinations:
-                    used_combinations.add((sentence, term))
-
-                    if random.choice([True, False]):
-                        true_statement = sentence.strip()
-                        if true_statement not in used_statements:
-                            statements.append((true_statement, True))
-                            used_statements.add(true_statement)
-                    else:
-                        alternate_terms = [t for t in quiz_terms if t != term]
-                        if alternate_terms:
-                            random_term = random.choice(alternate_terms)
-                            modified_sentence = sentence.replace(term, random_term.upper())
-                            if modified_sentence not in used_statements:
-                                statements.append((modified_sentence.strip(), False))
-                                used_statements.add(modified_sentence)
-
-                    if len(statements) >= num_questions:
-                        return statements
-                    break
-        attempts += 1
+    if not model_path or not os.path.exists(model_path):
+        return None
+    try:
+        saved_model = joblib.load(model_path)
+    except Exception as e:
+        logger.warning("Ignoring unreadable TF-IDF model %s: %s", model_path, e)
+        return None
+    if saved_model.get('fingerprint') != fingerprint:
+        return None
 
-    debug_print(f"Generated {len(statements)} statements after {attempts} attempts.")
+    logger.info("Reusing TF-IDF model from %s", model_path)
+    return saved_model['vectorizer'], saved_model['tfidf_matrix']
 
-    return statements
 
-# Main function to handle multiple text files
-def generate_quizzes_for_files(file_paths, num_questions):
+def _save_model(model_path, fingerprint, vectorizer, tfidf_matrix):
+    import joblib
+
+    if not model_path or vectorizer is None:
+        return
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    joblib.dump({'fingerprint': fingerprint, 'vectorizer': vectorizer, 'tfidf_matrix': tfidf_matrix}, model_path)
+
+
+# Load the saved corpus model, refitting only if the corpus changed
+def load_or_fit_corpus_tfidf(file_names, texts, model_path=None, vocabulary=None):
     """
-    Generates quizzes for multiple text files.
+    Returns the corpus TF-IDF model, reusing the one saved at model_path when the corpus is unchanged.
 
     Args:
-        file_paths (list): List of file paths to process.
-        num_questions (int): Number of questions to generate for each file.
+        file_names (list): Names of the documents in the corpus.
+        texts (list): The document texts, in the same order as file_names.
+        model_path (str): Where the fitted model is saved. If None, the model is not persisted.
+        vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits.
 
     Returns:
-        dict: A dictionary where keys are file names and values are lists of True/False statements.
+        tuple: The fitted vectorizer and its sparse document-term matrix, or (None, None).
+    """
+    fingerprint = _vocabulary_fingerprint(corpus_fingerprint(file_names, texts), vocabulary)
+    saved_model = _load_saved_model(model_path, fingerprint)
+    if saved_model is not None:
+        return saved_model
+
+    vectorizer, tfidf_matrix = fit_corpus_tfidf(texts, vocabulary)
+    _save_model(model_path, fingerprint, vectorizer, tfidf_matrix)
+    return vectorizer, tfidf_matrix
+
+
+def load_or_fit_corpus_tfidf_from_counts(file_names, digests, term_counts, model_path=None, vocabulary=None):
     """
-    quizzes = {}
+    Returns the corpus TF-IDF model fitted from cached term counts, reusing the saved one when the corpus is unchanged.
 
-    for file_path in file_paths:
-        text = load_text(file_path)
-        tfidf_scores = calculate_tfidf(text)
-        quiz_terms = select_quiz_terms(tfidf_scores, n_terms=10, variation=5)
-        statements = generate_true_false_statements(text, quiz_terms, num_questions)
+    Args:
+        file_names (list): Names of the documents in the corpus.
+        digests (list): Content digest of each document, see Document.digest.
+        term_counts (list): Term counts of each document, see count_terms.
+        model_path (str): Where the fitted model is saved. If None, the model is not persisted.
+        vocabulary (VocabularyOptions): Vocabulary limits, as in fit_corpus_tfidf_from_counts.
 
-        # Store the quiz statements for each file
-        file_name = os.path.basename(file_path)
-        quizzes[file_name] = statements
+    Returns:
+        tuple: The fitted model and its sparse document-term matrix, or (None, None).
+    """
+    fingerprint = _vocabulary_fingerprint(corpus_fingerprint_from_digests(file_names, digests), vocabulary)
+    saved_model = _load_saved_model(model_path, fingerprint)
+    if saved_model is not None:
+        return saved_model
 
-    return quizzes
+    model, tfidf_matrix = fit_corpus_tfidf_from_counts(term_counts, vocabulary)
+    _save_model(model_path, fingerprint, model, tfidf_matrix)
+    return model, tfidf_matrix
 
 
-def export_quizzes_to_files(quizzes, output_dir="Quizzes"):
+# Read one document's scores out of the corpus matrix
+def tfidf_row_arrays(tfidf_matrix, row, feature_names):
     """
-    Generates quizzes for multiple text files.
-    Exports quizzes to text files: one with answers and one without.
+    Extracts the non-zero terms and TF-IDF scores of one document as parallel arrays.
+
+    Only the stored entries of the sparse row are touched, so the cost depends on
+    the number of distinct terms in the document, not on the corpus vocabulary.
 
     Args:
-        quizzes (dict): A dictionary where keys are file names and values are lists of (statement, answer) tuples.
-        output_dir (str): Directory where output files will be saved.
+        tfidf_matrix (scipy.sparse.csr_matrix): The corpus document-term matrix.
+        row (int): Index of the document in the matrix.
+        feature_names (numpy.ndarray): The vocabulary, indexed by column.
 
     Returns:
-        tuple: Paths of the two output files.
+        tuple: A numpy array of terms and a numpy array of their TF-IDF scores.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    start, end = tfidf_matrix.indptr[row], tfidf_matrix.indptr[row + 1]
+    return feature_names[tfidf_matrix.indices[start:end]], tfidf_matrix.data[start:end]
+
 
-    with_answers_file = os.path.join(output_dir, f"quiz-with-answers-{timestamp}.txt")
-    without_answers_file = os.path.join(output_dir, f"quiz-without-answers-{timestamp}.txt")
+def tfidf_scores_from_row(tfidf_matrix, row, feature_names):
+    """
+    Extracts the non-zero TF-IDF scores of one document.
 
-    with open(with_answers_file, "w") as answers_file, open(without_answers_file, "w") as questions_file:
-        for file_name, statements in quizzes.items():
-            answers_file.write(f"Quiz for {file_name}:\n")
-            questions_file.write(f"Quiz for {file_name}:\n")
-            for i, (statement, is_true) in enumerate(statements, 1):
-                answers_file.write(f"Statement {i}: {statement.strip()}\nAnswer: {'True' if is_true else 'False'}\n\n")
-                questions_file.write(f"Statement {i}: {statement.strip()}\n\n")
-            answers_file.write("=" * 40 + "\n\n")
-            questions_file.write("=" * 40 + "\n\n")
+    Args:
+        tfidf_matrix (scipy.sparse.csr_matrix): The corpus document-term matrix.
+        row (int): Index of the document in the matrix.
+        feature_names (numpy.ndarray): The vocabulary, indexed by column.
 
-    return with_answers_file, without_answers_file
+    Returns:
+        TermScores: A mapping where keys are terms and values are TF-IDF scores.
+    """
+    terms, scores = tfidf_row_arrays(tfidf_matrix, row, feature_names)
+    return TermScores(terms, scores)
 
 
-# Base directory for text bank
-base_dir = os.path.join(os.path.dirname(__file__), 'Test Bank')
+def _resolve_rng(rng, seed):
+    # An explicit rng wins; otherwise a seed gives a private, reproducible stream
+    if rng is not None:
+        return rng
+    return random.Random(seed) if seed is not None else random
+
+
+# Select key terms for quiz with varied ranking to avoid repetition
+def select_quiz_terms(tfidf_scores, n_terms=5, variation=10, guaranteed_terms=None, rng=None, seed=None):
+    """
+    Selects key terms for quiz questions by varying the ranking of terms to increase variety.
+    Terms may be phrases of several words, such as the ones from a VocabularyOptions ngram_range.
+    Args:
+        tfidf_scores (Mapping): Terms with their TF-IDF scores, such as a TermScores or a dict.
+        n_terms (int): Number of terms to select for the quiz.
+        variation (int): The variation in term selection to prevent repetition.
+        guaranteed_terms (list): Terms that must be included if present in the TF-IDF scores.
+        rng (random.Random): Source of randomness. Defaults to the global random module.
+        seed (int): Seed for a private random.Random, used when rng is None.
+    Returns:
+        list: A list of selected terms for generating quiz questions.
+    """
+    import numpy as np
+
+    if isinstance(tfidf_scores, TermScores):
+        terms, scores = tfidf_scores.terms, tfidf_scores.scores
+    else:
+        terms = np.array(list(tfidf_scores.keys()), dtype=object)
+        scores = np.fromiter(tfidf_scores.values(), dtype=float, count=len(tfidf_scores))
+    return select_top_quiz_terms(terms, scores, n_terms, variation, guaranteed_terms, rng, seed)
+
+
+def select_top_quiz_terms(terms, scores, n_terms=5, variation=10, guaranteed_terms=None, rng=None, seed=None):
+    """
+    Selects key terms for quiz questions from parallel arrays of terms and scores.
+
+    Walking the ranking with random skips of 1 to `variation` places never goes
+    further than `variation` places per visited term, so only that window of top
+    candidates is partially selected and sorted, and all the skips are drawn at once.
+
+    Args:
+        terms (numpy.ndarray): Terms of the document, such as the ones from tfidf_row_arrays.
+        scores (numpy.ndarray): TF-IDF score of each term.
+        n_terms (int): Number of terms to select for the quiz.
+        variation (int): The variation in term selection to prevent repetition.
+        guaranteed_terms (list): Terms that must be included if present in the terms.
+        rng (random.Random): Source of randomness. Defaults to the global random module.
+        seed (int): Seed for a private random.Random, used when rng is None.
+    Returns:
+        list: A list of selected terms for generating quiz questions.
+    """
+    import numpy as np
+
+    rng = _resolve_rng(rng, seed)
+    selected_terms = []
+
+    # Ensure guaranteed terms are included
+    if guaranteed_terms and len(terms):
+        guaranteed_terms = list(dict.fromkeys(guaranteed_terms))
+        present = set(np.asarray(guaranteed_terms, dtype=object)[np.isin(guaranteed_terms, terms)])
+        selected_terms = [term for term in guaranteed_terms if term in present]
+    used_terms = set(selected_terms)
+
+    # Randomly select additional terms: each visit either adds a term or lands on a
+    # guaranteed one, so this many visits are always enough.
+    visits = n_terms
+    window = min(len(scores), visits * variation)
+    if len(selected_terms) < n_terms and window:
+        if window < len(scores):
+            top = np.argpartition(-scores, window - 1)[:window]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        # Skip ahead by a random number for variety
+        skips = np.random.default_rng(rng.getrandbits(64)).integers(1, variation + 1, size=visits)
+        positions = np.concatenate(([0], np.cumsum(skips[:-1])))
+        for term in terms[top[positions[positions < window]]].tolist():
+            if term not in used_terms:
+                selected_terms.append(term)
+                used_terms.add(term)
+                if len(selected_terms) >= n_terms:
+                    break
+
+    logger.debug("Selected quiz terms: %s", selected_terms)
+    return selected_terms
+
 
-# List of text files to process
-file_paths = [
-    os.path.join(base_dir, 'Array Basics.txt'),
-    os.path.join(base_dir, 'Introduction to Data Structures.txt'),
-    # Add additional files
-]
+# Split the text into sentences
+# A sentence runs up to '.', '!' or '?' followed by whitespace, or up to a line break.
+# Each alternative starts with a different character class, so matching never backtracks far.
+_SENTENCE = re.compile(
+    r'(?:[^\s.!?]|[.!?]+(?!\s|\Z))(?:[^.!?\s]+|[^\S\n]+(?=\S)|[.!?]+(?!\s|\Z))*[.!?]*|[.!?]+'
+)
 
-# Set number of questions per file
-num_questions = 5
 
-# Generate quizzes
-quizzes = generate_quizzes_for_files(file_paths, num_questions)
+def iter_sentence_spans(text):
+    """
+    Yields the (start, end) offsets of the sentences of a document, one at a time.
+
+    A sentence ends at '.', '!' or '?' followed by whitespace, or at a line break,
+    so headings and list items are sentences of their own. Surrounding whitespace
+    is not part of a sentence and empty sentences are skipped.
+
+    Args:
+        text (str): The document text.
+
+    Yields:
+        tuple: The start and end offsets of each sentence.
+    """
+    for match in _SENTENCE.finditer(text):
+        yield match.span()
+
+
+class Sentences(collections.abc.Sequence):
+    """
+    The sentences of a document, stored as offsets into its text.
+
+    Offsets are kept in two compact integer arrays, and the text of a sentence
+    is only copied out of the document when it is indexed.
+    """
+
+    __slots__ = ('text', 'starts', 'ends')
+
+    def __init__(self, text, spans=None):
+        """
+        Args:
+            text (str): The document text.
+            spans (iterable): The (start, end) offsets of the sentences. Defaults to iter_sentence_spans(text).
+        """
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        for start, end in iter_sentence_spans(text) if spans is None else spans:
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def __iter__(self):
+        text = self.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+    def __getstate__(self):
+        return self.text, self.starts, self.ends
+
+    def __setstate__(self, state):
+        self.text, self.starts, self.ends = state
+
+
+# Split text into sentences
+def split_sentences(text):
+    """
+    Splits a document into sentences.
+
+    Args:
+        text (str): The document text.
+
+    Returns:
+        Sentences: The sentences of the text, as offsets into it.
+    """
+    return Sentences(text)
+
+
+# Index which sentences mention each quiz term
+def compile_term_matcher(quiz_terms):
+    """
+    Compiles one pattern that finds whole-word occurrences of all quiz terms.
+
+    Every match is zero-width and holds one optional lookahead group per term, so terms
+    that overlap, such as a phrase and a word inside it, are each found in a single scan.
+    Whether a term matches does not depend on which other terms were compiled with it.
+
+    Args:
+        quiz_terms (list): Terms selected for the quiz.
+
+    Returns:
+        tuple: The compiled pattern and the terms in group order, group i + 1 holding terms[i],
+        or (None, []) if there are no terms.
+    """
+    terms = sorted({term for term in quiz_terms if term}, key=len, reverse=True)
+    if not terms:
+        return None, []
+    alternatives = '|'.join(re.escape(term) for term in terms)
+    groups = ''.join(rf'(?:(?=({re.escape(term)})(?!\w)))?' for term in terms)
+    # The leading lookahead skips positions where no term starts
+    return re.compile(rf'(?<!\w)(?=(?:{alternatives})(?!\w)){groups}'), terms
+
+
+# Build an inverted index from quiz terms to the sentences that contain them
+def build_sentence_index(sentences, quiz_terms):
+    """
+    Builds an inverted index from each quiz term to the sentences that contain it.
+
+    All terms are matched at once with compile_term_matcher, in one pass over the sentences.
+    Matches are whole words, so "array" does not match inside "arrays", and each term is
+    matched on its own, so "binary" is found inside "binary search".
+
+    Args:
+        sentences (list): The document's sentences.
+        quiz_terms (list): Terms selected for the quiz.
+
+    Returns:
+        dict: A dictionary where keys are terms and values are lists of (sentence id, spans)
+        tuples, spans being a list of the (start, end) offsets of the term in that sentence.
+        Terms that occur in no sentence are left out.
+    """
+    pattern, terms = compile_term_matcher(quiz_terms)
+    sentence_index = {}
+    if pattern is None:
+        return sentence_index
+
+    if isinstance(sentences, Sentences):
+        # Scan the whole document once and place each match in its sentence by offset.
+        # Matches arrive in text order, so a term's matches in one sentence are consecutive.
+        starts, ends = sentences.starts, sentences.ends
+        for match in pattern.finditer(sentences.text):
+            sentence_id = bisect.bisect_right(starts, match.start()) - 1
+            if sentence_id < 0:
+                continue
+            offset, sentence_end = starts[sentence_id], ends[sentence_id]
+            for term, (start, end) in zip(terms, match.regs[1:]):
+                if start < 0 or end > sentence_end:
+                    continue  # Not at this position, or spans a sentence boundary
+                occurrences = sentence_index.setdefault(term, [])
+                if occurrences and occurrences[-1][0] == sentence_id:
+                    occurrences[-1][1].append((start - offset, end - offset))
+                else:
+                    occurrences.append((sentence_id, [(start - offset, end - offset)]))
+        return sentence_index
+
+    for sentence_id, sentence in enumerate(sentences):
+        spans = {}
+        for match in pattern.finditer(sentence):
+            for term, span in zip(terms, match.regs[1:]):
+                if span[0] >= 0:
+                    spans.setdefault(term, []).append(span)
+        for term, term_spans in spans.items():
+            sentence_index.setdefault(term, []).append((sentence_id, term_spans))
+    return sentence_index
+
+
+# Keep a bounded sample of the sentences of a large document
+def sample_term_sentences(file_path, encoding, quiz_terms, reservoir_size=SENTENCE_RESERVOIR_SIZE, rng=None,
+                          chunk_size=CHUNK_SIZE, metrics=None, seed=None):
+    """
+    Streams a document and keeps a uniform random sample of the sentences that mention each quiz term.
+
+    Each term keeps a reservoir of at most reservoir_size sentences, so memory is
+    bounded by the number of quiz terms rather than by the size of the document.
+
+    Args:
+        file_path (str): Path to the text file.
+        encoding (str): The encoding to decode the file with, from build_chunked_artifacts.
+        quiz_terms (list): Terms selected for the quiz.
+        reservoir_size (int): The most sentences kept per term.
+        rng (random.Random): Source of randomness. Defaults to the global random module.
+        chunk_size (int): The window size, in characters.
+        metrics (PipelineMetrics): Receives the bytes_read counter.
+        seed (int): Seed for a private random.Random, used when rng is None.
+
+    Returns:
+        list: The sampled sentences, in document order.
+    """
+    rng = _resolve_rng(rng, seed)
+    quiz_terms = list(dict.fromkeys(quiz_terms))
+    reservoirs = {term: [] for term in quiz_terms}
+    seen = dict.fromkeys(quiz_terms, 0)
+
+    first_sentence = 0
+    for window in iter_document_chunks(file_path, encoding, chunk_size, metrics=metrics):
+        sentences = Sentences(window)
+        sentence_index = build_sentence_index(sentences, quiz_terms)
+        for term in quiz_terms:
+            reservoir = reservoirs[term]
+            for sentence_id, _ in sentence_index.get(term, ()):
+                seen[term] += 1
+                if len(reservoir) < reservoir_size:
+                    reservoir.append((first_sentence + sentence_id, sentences[sentence_id]))
+                else:
+                    slot = rng.randrange(seen[term])
+                    if slot < reservoir_size:
+                        reservoir[slot] = (first_sentence + sentence_id, sentences[sentence_id])
+        first_sentence += len(sentences)
+
+    sampled = dict(entry for reservoir in reservoirs.values() for entry in reservoir)
+    return [sampled[position] for position in sorted(sampled)]
+
+
+def _replace_spans(sentence, spans, replacement):
+    # Substitutes by position, so the sentence is not searched again
+    parts = []
+    position = 0
+    for start, end in spans:
+        parts.append(sentence[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(sentence[position:])
+    return ''.join(parts)
+
+
+class Statements(collections.abc.Sequence):
+    """
+    True/False statements stored as integer records, rendered to text when read.
+
+    A record is a sentence id, a term id, a replacement term id and the spans of the
+    term in the sentence. The replacement id is -1 for a true statement; a false
+    statement replaces the term at its spans with the replacement, upper-cased.
+    Records live in compact integer arrays next to a reference to the document's
+    sentences, so no statement text exists until an item is read, for instance
+    when a quiz is exported. Items are (statement, answer) tuples, and a Statements
+    compares equal to a list of the same tuples.
+
+    Pickling keeps only the sentences the records refer to, not the whole document.
+    """
+
+    __slots__ = ('sentences', 'terms', 'sentence_ids', 'term_ids', 'replacement_ids', 'span_ends', 'spans')
+
+    def __init__(self, sentences, terms):
+        """
+        Args:
+            sentences (Sequence): The sentences the records refer to, such as a Sentences.
+            terms (list): The terms the term and replacement ids refer to.
+        """
+        self.sentences = sentences
+        self.terms = list(terms)
+        self.sentence_ids = array('q')
+        self.term_ids = array('l')
+        self.replacement_ids = array('l')
+        self.span_ends = array('q')  # End of each record's slice of spans
+        self.spans = array('q')  # Flattened (start, end) offsets of the replaced term
+
+    def append(self, sentence_id, term_id, replacement_id=-1, spans=()):
+        """
+        Adds a record.
+
+        Args:
+            sentence_id (int): Index of the sentence in sentences.
+            term_id (int): Index of the quiz term in terms.
+            replacement_id (int): Index of the replacement in terms, or -1 for a true statement.
+            spans (list): The (start, end) offsets of the term in the sentence, needed for false statements.
+        """
+        self.sentence_ids.append(sentence_id)
+        self.term_ids.append(term_id)
+        self.replacement_ids.append(replacement_id)
+        if replacement_id >= 0:
+            for start, end in spans:
+                self.spans.append(start)
+                self.spans.append(end)
+        self.span_ends.append(len(self.spans))
+
+    def __len__(self):
+        return len(self.sentence_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        sentence = self.sentences[self.sentence_ids[index]]
+        replacement_id = self.replacement_ids[index]
+        if replacement_id < 0:
+            return sentence.strip(), True
+        start = self.span_ends[index - 1] if index else 0
+        flat = self.spans[start:self.span_ends[index]]
+        spans = zip(flat[::2], flat[1::2])
+        return _replace_spans(sentence, spans, self.terms[replacement_id].upper()).strip(), False
+
+    def __eq__(self, other):
+        if isinstance(other, (Statements, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Statements({list(self)!r})"
+
+    def compact(self):
+        """
+        Returns a copy that only keeps the sentences its records refer to.
+        """
+        statements = Statements.__new__(Statements)
+        statements.__setstate__(self.__getstate__())
+        return statements
+
+    def __getstate__(self):
+        used = sorted(set(self.sentence_ids))
+        new_ids = {sentence_id: new_id for new_id, sentence_id in enumerate(used)}
+        sentences = tuple(self.sentences[sentence_id] for sentence_id in used)
+        sentence_ids = array('q', [new_ids[sentence_id] for sentence_id in self.sentence_ids])
+        return (
+            sentences, self.terms, sentence_ids, array('l', self.term_ids), array('l', self.replacement_ids),
+            array('q', self.span_ends), array('q', self.spans),
+        )
+
+    def __setstate__(self, state):
+        (self.sentences, self.terms, self.sentence_ids, self.term_ids, self.replacement_ids, self.span_ends,
+         self.spans) = state
+
+
+# Similarity of quiz terms across the corpus, for ranking distractors
+def corpus_term_similarity(tfidf_columns, feature_names, quiz_terms):
+    """
+    Computes the cosine similarity of quiz terms from their TF-IDF columns across the corpus.
+
+    Terms that carry weight in the same chapters get a high similarity.
+
+    Args:
+        tfidf_columns (scipy.sparse.csc_matrix): The corpus document-term matrix in CSC form,
+            so columns can be sliced without scanning the whole matrix.
+        feature_names (numpy.ndarray): The sorted vocabulary, indexed by column.
+        quiz_terms (list): Terms selected for the quiz.
+
+    Returns:
+        numpy.ndarray: A len(quiz_terms) x len(quiz_terms) similarity matrix.
+    """
+    import numpy as np
+
+    columns = np.searchsorted(feature_names, quiz_terms)
+    columns = np.minimum(columns, len(feature_names) - 1)
+    found = feature_names[columns] == np.asarray(quiz_terms, dtype=object)
+
+    term_vectors = tfidf_columns[:, columns].T.tocsr()
+    term_vectors = term_vectors.multiply(found[:, None].astype(float)).tocsr()
+    return _cosine_similarity(term_vectors)
+
+
+def _cosine_similarity(vectors):
+    import numpy as np
+
+    products = (vectors @ vectors.T).toarray()
+    norms = np.sqrt(np.diag(products))
+    norms[norms == 0] = 1.0
+    return products / np.outer(norms, norms)
+
+
+# Rank plausible replacements for each quiz term
+def build_distractor_table(quiz_terms, sentence_index, num_sentences, term_similarity=None):
+    """
+    Ranks, for every quiz term, the other quiz terms by how plausible they are as a replacement.
+
+    Similarity comes from sentence co-occurrence (cosine of the terms' sentence sets),
+    averaged with term_similarity when given, and is computed for all pairs at once.
+
+    Args:
+        quiz_terms (list): Terms selected for the quiz.
+        sentence_index (dict): The index from build_sentence_index.
+        num_sentences (int): Number of sentences in the document.
+        term_similarity (numpy.ndarray): Optional similarity matrix aligned with quiz_terms,
+            such as the one from corpus_term_similarity.
+
+    Returns:
+        dict: A dictionary where keys are terms and values are lists of the other terms,
+        most plausible first.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    quiz_terms = list(quiz_terms)
+    if len(quiz_terms) < 2:
+        return {term: [] for term in quiz_terms}
+
+    sentence_ids = [[sentence_id for sentence_id, _ in sentence_index.get(term, [])] for term in quiz_terms]
+    term_ids = np.repeat(np.arange(len(quiz_terms)), [len(ids) for ids in sentence_ids])
+    rows = np.fromiter((i for ids in sentence_ids for i in ids), dtype=np.int64, count=len(term_ids))
+    incidence = csr_matrix(
+        (np.ones(len(term_ids)), (term_ids, rows)), shape=(len(quiz_terms), max(num_sentences, 1)),
+    )
+    incidence.data[:] = 1.0  # A term counts once per sentence
+    similarity = _cosine_similarity(incidence)
+    if term_similarity is not None:
+        similarity = (similarity + term_similarity) / 2
+
+    np.fill_diagonal(similarity, -np.inf)
+    ranking = np.argsort(-similarity, axis=1, kind='stable')[:, :-1]  # The term itself sorts last
+    return {term: [quiz_terms[j] for j in ranking[i]] for i, term in enumerate(quiz_terms)}
+
+
+# Generate True/False statements, avoiding duplicates
+def generate_true_false_statements(text, quiz_terms, num_questions, max_attempts=100, rng=None, sentence_index=None,
+                                   sentences=None, distractors=None, metrics=None, seed=None):
+    """
+    Generates True/False statements from sentences that mention the quiz terms.
+
+    Each round visits the quiz terms in random order and draws, for every term,
+    one sentence it has not used yet straight from the sentence index. The cost
+    therefore depends on the number of questions requested rather than on the
+    length of the document, and generation stops as soon as every (sentence, term)
+    pair has been drawn. False statements replace the term at the positions recorded
+    in the index. Statements are kept as integer records (see Statements), so
+    duplicates are detected without building any text.
+
+    Args:
+        text (str): The document text.
+        quiz_terms (list): Terms selected for the quiz.
+        num_questions (int): Number of statements to generate.
+        max_attempts (int): Maximum number of rounds over the quiz terms.
+        rng (random.Random): Source of randomness. Defaults to the global random module.
+        sentence_index (dict): A prebuilt index from build_sentence_index. Built here if None.
+        sentences (Sequence): The document's sentences, from split_sentences. Split from text if None.
+        distractors (dict): A prebuilt table from build_distractor_table. False statements replace
+            their term with one of its DISTRACTOR_CHOICES most similar terms. Built here if None.
+        metrics (PipelineMetrics): Receives the attempts and statements counters.
+        seed (int): Seed for a private random.Random, used when rng is None.
+
+    Returns:
+        Statements: The (statement, answer) tuples, stored as integer records and rendered when read.
+    """
+    rng = _resolve_rng(rng, seed)
+    if sentences is None:
+        sentences = split_sentences(text)
+    if not isinstance(sentences, (list, Sentences)) or not sentences:
+        logger.debug("Invalid or empty sentences. Returning no statements.")
+        return []
+
+    quiz_terms = list(dict.fromkeys(quiz_terms))
+    if sentence_index is None:
+        sentence_index = build_sentence_index(sentences, quiz_terms)
+    if distractors is None:
+        distractors = build_distractor_table(quiz_terms, sentence_index, len(sentences))
+
+    # Per-term draw state for a lazy Fisher-Yates shuffle: how many sentence ids have
+    # been drawn, and the swaps made so far, so the index itself is never copied or mutated.
+    active_terms = [term for term in quiz_terms if sentence_index.get(term)]
+    drawn_counts = dict.fromkeys(active_terms, 0)
+    swapped_occurrences = {term: {} for term in active_terms}
+
+    max_possible_statements = sum(len(sentence_index[term]) for term in active_terms)
+    num_questions = min(num_questions, max_possible_statements)  # Cap questions to maximum possible
+    logger.debug("Max possible statements: %d", max_possible_statements)
+
+    # Statements are deduplicated on their (sentence, term, replacement) ids; a true
+    # statement is the same whichever term drew it. A drawn sentence whose stripped text
+    # was drawn before shares that sentence's id, so only drawn sentences are hashed.
+    canonical_ids = {}
+    statements = Statements(sentences, quiz_terms)
+    term_ids = {term: term_id for term_id, term in enumerate(quiz_terms)}
+    used_statements = set()
+    attempts = 0
+
+    while len(statements) < num_questions and active_terms and attempts < max_attempts:
+        rng.shuffle(active_terms)
+        for term in active_terms:
+            occurrences = sentence_index[term]
+            swaps = swapped_occurrences[term]
+            drawn = drawn_counts[term]
+            pick = rng.randrange(drawn, len(occurrences))
+            sentence_id, spans = swaps.get(pick, occurrences[pick])
+            swaps[pick] = swaps.get(drawn, occurrences[drawn])
+            drawn_counts[term] = drawn + 1
+            canonical_id = canonical_ids.setdefault(sentences[sentence_id].strip(), sentence_id)
+
+            if rng.choice([True, False]):
+                key = (canonical_id, -1, -1)
+                if key not in used_statements:
+                    statements.append(sentence_id, term_ids[term])
+                    used_statements.add(key)
+            else:
+                alternate_terms = distractors.get(term)
+                if alternate_terms:
+                    random_term = alternate_terms[rng.randrange(min(DISTRACTOR_CHOICES, len(alternate_terms)))]
+                    replacement_id = term_ids.get(random_term)
+                    if replacement_id is None:  # A distractor from outside the quiz terms
+                        replacement_id = term_ids[random_term] = len(statements.terms)
+                        statements.terms.append(random_term)
+                    key = (canonical_id, term_ids[term], replacement_id)
+                    if key not in used_statements:
+                        statements.append(sentence_id, key[1], replacement_id, spans)
+                        used_statements.add(key)
+
+            if len(statements) >= num_questions:
+                break
+
+        active_terms = [term for term in active_terms if drawn_counts[term] < len(sentence_index[term])]
+        attempts += 1
+
+    logger.debug("Generated %d statements after %d attempts.", len(statements), attempts)
+    metrics = _metrics_or_null(metrics)
+    metrics.count('attempts', attempts)
+    metrics.count('statements', len(statements))
+
+    return statements
+
+# Derive a per-file seed so results do not depend on processing order
+def derive_file_seed(seed, file_name):
+    """
+    Derives a deterministic seed for one file from the run seed.
+
+    Args:
+        seed (int): The seed of the whole run.
+        file_name (str): Name of the file being processed.
+
+    Returns:
+        int: A 64-bit seed that only depends on the run seed and the file name.
+    """
+    digest = hashlib.sha256(f"{seed}:{file_name}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _generate_statements_job(job, sentence_index=None, metrics=None):
+    sentences, quiz_terms, num_questions, file_seed, term_similarity = job
+    metrics = _metrics_or_null(metrics)
+    with metrics.stage('generate_statements'):
+        if sentence_index is None:
+            sentence_index = build_sentence_index(sentences, quiz_terms)
+        distractors = build_distractor_table(quiz_terms, sentence_index, len(sentences), term_similarity)
+
+        # Statements draw from their own stream, so reusing cached quiz terms does not change them
+        rng = random.Random(derive_file_seed(file_seed, 'statements'))
+        return generate_true_false_statements(
+            None, quiz_terms, num_questions, rng=rng, sentence_index=sentence_index, sentences=sentences,
+            distractors=distractors, metrics=metrics,
+        )
+
+
+# Runs in a worker process in parallel mode; the metrics travel back with the statements
+def _generate_statements_in_worker(job):
+    metrics = PipelineMetrics()
+    statements = _generate_statements_job(job, metrics=metrics)
+    return statements, metrics.snapshot()
+
+
+@dataclass
+class DocumentArtifacts:
+    """
+    Everything derived from a document's contents alone, as stored in the DocumentCache.
+
+    Documents processed in chunked mode (see build_chunked_artifacts) have no text
+    or sentences; those attributes are None.
+
+    Attributes:
+        digest (str): SHA-256 hex digest of the raw file contents.
+        text (str): The decoded text.
+        encoding (str): The encoding the text was decoded with.
+        sentences (Sentences): The sentences from split_sentences.
+        term_counts (dict): Term counts from count_terms, used to refit the corpus TF-IDF model.
+    """
+    digest: str
+    text: str
+    encoding: str
+    sentences: Sentences
+    term_counts: dict
+
+
+def build_document_artifacts(document, vocabulary=None):
+    """
+    Computes the content-derived artifacts of a loaded document.
+
+    Args:
+        document (Document): The loaded document.
+        vocabulary (VocabularyOptions): Its ngram_range sets the lengths of the counted terms.
+
+    Returns:
+        DocumentArtifacts: The document's artifacts.
+    """
+    return DocumentArtifacts(
+        document.digest, document.text, document.encoding, split_sentences(document.text),
+        count_terms(document.text, vocabulary),
+    )
+
+
+# Count the terms of a large document without loading it whole
+def build_chunked_artifacts(file_path, chunk_size=CHUNK_SIZE, max_terms=CHUNK_MAX_TERMS, metrics=None,
+                            vocabulary=None):
+    """
+    Computes the artifacts of a document in chunked mode, with memory bounded by chunk_size and max_terms.
+
+    The file is streamed once per tried encoding. Term counts are accumulated window by
+    window; whenever more than twice max_terms distinct terms are held, only the max_terms
+    most frequent are kept, so the counts of rare terms are approximate. The text
+    and sentences are not kept; quiz sentences are sampled later with
+    sample_term_sentences.
+
+    Args:
+        file_path (str): Path to the text file.
+        chunk_size (int): The window size, in characters.
+        max_terms (int): The number of distinct terms to keep.
+        metrics (PipelineMetrics): Receives the bytes_read counter.
+        vocabulary (VocabularyOptions): Its ngram_range sets the lengths of the counted terms.
+
+    Returns:
+        DocumentArtifacts: The digest, encoding and term counts, with text and sentences set to None.
+
+    Raises:
+        ValueError: If the file cannot be read with the specified encodings.
+    """
+    analyzer = _term_analyzer(_ngram_range(vocabulary))
+    for encoding in ENCODINGS:
+        digest = hashlib.sha256()
+        term_counts = collections.Counter()
+        try:
+            for window in iter_document_chunks(file_path, encoding, chunk_size, digest, metrics):
+                term_counts.update(analyzer(window))
+                if len(term_counts) > 2 * max_terms:
+                    term_counts = collections.Counter(dict(term_counts.most_common(max_terms)))
+        except UnicodeDecodeError:
+            continue
+        if len(term_counts) > max_terms:
+            term_counts = collections.Counter(dict(term_counts.most_common(max_terms)))
+        return DocumentArtifacts(digest.hexdigest(), None, encoding, None, dict(term_counts))
+
+    raise ValueError("Unable to read the file with the tried encodings.")
+
+
+def _artifacts_key(digest, chunked=False, ngram_range=(1, 1)):
+    # Bumped whenever DocumentArtifacts changes, so stale entries are rebuilt rather than reused
+    key = f"{digest}-v{ARTIFACTS_VERSION}"
+    if chunked:
+        key += f"-chunked{CHUNK_MAX_TERMS}"
+    if ngram_range != (1, 1):
+        key += f"-ngrams{ngram_range[0]}-{ngram_range[1]}"
+    return key
+
+
+def _is_chunked(file_path, chunk_size):
+    return chunk_size is not None and os.path.getsize(file_path) > chunk_size
+
+
+def _file_digest(file_path, metrics=None):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for data in iter(functools.partial(file.read, CHUNK_SIZE), b''):
+            digest.update(data)
+            _metrics_or_null(metrics).count('bytes_read', len(data))
+    return digest.hexdigest()
+
+
+# Incremental rebuild cache
+class DocumentCache:
+    """
+    On-disk cache of per-document artifacts keyed by the SHA-256 of the file contents.
+
+    Files whose size and modification time are unchanged since the last run are not
+    read at all; edited files are re-read, hashed and only reprocessed if their
+    contents actually changed. Derived values such as selected quiz terms can be
+    stored under any string key with get and put. Entries are evicted least
+    recently used first once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir=DOCUMENT_CACHE_DIR, max_bytes=DOCUMENT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Documents may be loaded from several prefetch threads at once
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        try:
+            with open(self._index_path) as file:
+                self._index = json.load(file)
+        except (OSError, ValueError):
+            self._index = {}
+        self._total_bytes = sum(size for _, size, _ in self._scan_entries())
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _scan_entries(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                yield stat.st_mtime_ns, stat.st_size, entry.path
+
+    def get(self, key):
+        """
+        Returns the value stored under key, or None if it is not cached.
+
+        Args:
+            key (str): A file-name-safe key, such as a hex digest.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(entry_path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", entry_path, e)
+            return None
+        return value
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting least recently used entries if the cache is full.
+
+        Args:
+            key (str): A file-name-safe key, such as a hex digest.
+            value: Any picklable value.
+        """
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            previous_size = os.path.getsize(entry_path) if os.path.exists(entry_path) else 0
+            os.replace(temp_path, entry_path)
+            self._total_bytes += os.path.getsize(entry_path) - previous_size
+
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=entry_path)
+
+    def _evict(self, keep):
+        for _, size, path in sorted(self._scan_entries()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+
+    def load_artifacts(self, file_path, metrics=None, chunk_size=None, vocabulary=None):
+        """
+        Returns the artifacts of a file, reprocessing it only if its contents changed.
+
+        Args:
+            file_path (str): Path to the text file.
+            metrics (PipelineMetrics): Receives the bytes_read, cache_hits and cache_misses counters.
+            chunk_size (int): If given, files larger than this are processed in chunked mode
+                with build_chunked_artifacts.
+            vocabulary (VocabularyOptions): Its ngram_range sets the lengths of the counted terms.
+                Term counts of each ngram_range are cached separately.
+
+        Returns:
+            DocumentArtifacts: The document's artifacts.
+        """
+        stat = os.stat(file_path)
+        ngram_range = _ngram_range(vocabulary)
+        chunked = chunk_size is not None and stat.st_size > chunk_size
+        index_key = os.path.abspath(file_path)
+        known = self._index.get(index_key)
+        metrics = _metrics_or_null(metrics)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            artifacts = self.get(_artifacts_key(known[2], chunked, ngram_range))
+            if artifacts is not None:
+                self._count_hit(metrics)
+                return artifacts
+
+        if chunked:
+            # Hash the file first, so an unchanged document is not counted again
+            document = None
+            digest = _file_digest(file_path, metrics)
+        else:
+            document = load_document(file_path, metrics)
+            digest = document.digest
+        artifacts = self.get(_artifacts_key(digest, chunked, ngram_range))
+        if artifacts is None:
+            with self._lock:
+                self.misses += 1
+            metrics.count('cache_misses')
+            if chunked:
+                artifacts = build_chunked_artifacts(file_path, chunk_size, metrics=metrics, vocabulary=vocabulary)
+            else:
+                artifacts = build_document_artifacts(document, vocabulary)
+            self.put(_artifacts_key(digest, chunked, ngram_range), artifacts)
+        else:
+            self._count_hit(metrics)
+
+        with self._lock:
+            self._index[index_key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return artifacts
+
+    def _count_hit(self, metrics):
+        with self._lock:
+            self.hits += 1
+        metrics.count('cache_hits')
+
+    def save(self):
+        """
+        Writes the file index, so the next run can skip reading unchanged files.
+        """
+        with self._lock:
+            index = dict(self._index)
+        temp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(index, file)
+        os.replace(temp_path, self._index_path)
+
+
+# Memo of generated quizzes
+class QuizMemo:
+    """
+    Least-recently-used memo of generated quizzes, in memory and optionally on disk.
+
+    A quiz only depends on the document contents, the corpus it was scored against,
+    the generation parameters and the seed, so key() combines exactly those. A
+    repeated request is answered from memory, or from the DocumentCache if one is
+    given, without selecting terms or drawing statements again.
+    """
+
+    def __init__(self, max_entries=QUIZ_MEMO_SIZE, cache=None):
+        """
+        Args:
+            max_entries (int): The most quizzes kept in memory.
+            cache (DocumentCache): If given, quizzes are also stored on disk, so they
+                survive the process and are shared between runs.
+        """
+        self.max_entries = max_entries
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def key(digest, fingerprint, num_questions, seed, chunked=False):
+        """
+        Builds the key of one quiz.
+
+        Args:
+            digest (str): SHA-256 hex digest of the document contents.
+            fingerprint (str): The corpus fingerprint, from corpus_fingerprint_from_digests.
+            num_questions (int): Number of questions of the quiz.
+            seed (int): The seed of the quiz, such as a file seed from derive_file_seed.
+            chunked (bool): Whether the document was processed in chunked mode, which draws
+                from a sample of its sentences.
+
+        Returns:
+            str: A hex digest usable as a cache key.
+        """
+        parameters = (
+            f"quiz:{digest}:{fingerprint}:{num_questions}:{seed}:{N_QUIZ_TERMS}:{TERM_VARIATION}:"
+            f"{DISTRACTOR_CHOICES}:{ARTIFACTS_VERSION}:{SENTENCE_RESERVOIR_SIZE if chunked else 0}"
+        )
+        return hashlib.sha256(parameters.encode('utf-8')).hexdigest()
+
+    def get(self, key, metrics=None):
+        """
+        Returns the quiz stored under key, or None if it was never generated.
+
+        Args:
+            key (str): A key from key().
+            metrics (PipelineMetrics): Receives the memo_hits and memo_misses counters.
+        """
+        statements = self._entries.get(key)
+        if statements is not None:
+            self._entries.move_to_end(key)
+        elif self.cache is not None:
+            statements = self.cache.get(key)
+            if statements is not None:
+                self._remember(key, statements)
+
+        metrics = _metrics_or_null(metrics)
+        if statements is None:
+            self.misses += 1
+            metrics.count('memo_misses')
+            return None
+        self.hits += 1
+        metrics.count('memo_hits')
+        return statements.compact() if isinstance(statements, Statements) else list(statements)
+
+    def put(self, key, statements):
+        """
+        Stores a generated quiz.
+
+        Args:
+            key (str): A key from key().
+            statements (Statements): The quiz. Only the sentences it uses are kept.
+        """
+        statements = statements.compact() if isinstance(statements, Statements) else list(statements)
+        self._remember(key, statements)
+        if self.cache is not None:
+            self.cache.put(key, statements)
+
+    def _remember(self, key, statements):
+        self._entries[key] = statements
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Read upcoming files on background threads while the current one is processed
+def iter_prefetched(function, items, depth=PREFETCH_DEPTH, metrics=None):
+    """
+    Applies function to items ahead of time on a thread pool and yields the results in order.
+
+    At most depth items are loading or waiting to be consumed at any time, so a slow
+    consumer holds the loader back instead of letting loaded files pile up in memory.
+    File reads release the GIL, so reading the next files overlaps with the
+    computation on the current one, which matters most on slow or network filesystems.
+
+    Args:
+        function (callable): Called as function(item, metrics) on a worker thread.
+        items (iterable): The items. They are consumed lazily, on the calling thread.
+        depth (int): Number of items processed ahead. With 0, function runs on the calling
+            thread as each result is requested.
+        metrics (PipelineMetrics): Each call records into its own PipelineMetrics, merged
+            into this one on the calling thread when its result is yielded.
+
+    Yields:
+        The result of function for each item, in the order of items.
+    """
+    metrics = _metrics_or_null(metrics)
+    if depth <= 0:
+        for item in items:
+            yield function(item, metrics)
+        return
+
+    def call(item):
+        call_metrics = PipelineMetrics()
+        return function(item, call_metrics), call_metrics.snapshot()
+
+    items = iter(items)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=depth, thread_name_prefix='prefetch')
+    pending = collections.deque(executor.submit(call, item) for item in itertools.islice(items, depth))
+    try:
+        while pending:
+            result, snapshot = pending.popleft().result()
+            # Start on the next item before handing this one over, so loading never waits for the consumer
+            pending.extend(executor.submit(call, item) for item in itertools.islice(items, 1))
+            metrics.merge(snapshot)
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _load_artifacts(file_path, cache, metrics=None, chunk_size=None, vocabulary=None):
+    metrics = _metrics_or_null(metrics)
+    with metrics.stage('load'):
+        if cache is not None:
+            artifacts = cache.load_artifacts(file_path, metrics, chunk_size, vocabulary)
+        elif _is_chunked(file_path, chunk_size):
+            artifacts = build_chunked_artifacts(file_path, chunk_size, metrics=metrics, vocabulary=vocabulary)
+        else:
+            artifacts = build_document_artifacts(load_document(file_path, metrics), vocabulary)
+    metrics.count('documents')
+    if artifacts.sentences is not None:
+        metrics.count('sentences', len(artifacts.sentences))
+    return artifacts
+
+
+def _iter_quizzes(file_paths, num_questions, model_path, workers, seed, cache, keep_documents, metrics,
+                  chunk_size=None, memo=None, prefetch=PREFETCH_DEPTH, vocabulary=None):
+    import numpy as np
+
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    metrics = _metrics_or_null(metrics)
+
+    file_names = _file_names(file_paths)
+
+    # First pass: content digests and term counts. With a cache, only changed files are reprocessed.
+    # Documents in chunked mode also record their encoding, to stream them again for sentences.
+    def load_artifacts(file_path, load_metrics):
+        return _load_artifacts(file_path, cache, load_metrics, chunk_size, vocabulary)
+
+    # Closed explicitly, so its threads are gone before workers are forked or the second pass starts its own
+    digests, term_counts, kept_artifacts, chunked_encodings = [], [], [], {}
+    with contextlib.closing(iter_prefetched(load_artifacts, file_paths, prefetch, metrics)) as loaded:
+        for file_path, artifacts in zip(file_paths, loaded):
+            digests.append(artifacts.digest)
+            term_counts.append(artifacts.term_counts)
+            if artifacts.sentences is None:
+                chunked_encodings[file_path] = artifacts.encoding
+            if keep_documents:
+                kept_artifacts.append(artifacts)
+
+    with metrics.stage('tfidf'):
+        model, tfidf_matrix = load_or_fit_corpus_tfidf_from_counts(
+            file_names, digests, term_counts, model_path, vocabulary,
+        )
+        feature_names = model.get_feature_names_out() if model is not None else None
+        tfidf_columns = tfidf_matrix.tocsc() if model is not None else None
+        fingerprint = _vocabulary_fingerprint(corpus_fingerprint_from_digests(file_names, digests), vocabulary)
+    metrics.count('vocabulary_size', len(feature_names) if feature_names is not None else 0)
+    del term_counts
+
+    # Plans are (row, file seed, memo key, memoized statements), one per file in order
+    def iter_plans():
+        for row, (file_path, file_name, digest) in enumerate(zip(file_paths, file_names, digests)):
+            file_seed = derive_file_seed(seed, file_name)
+            memo_key = statements = None
+            if memo is not None:
+                memo_key = memo.key(digest, fingerprint, num_questions, file_seed, file_path in chunked_encodings)
+                statements = memo.get(memo_key, metrics)
+            yield row, file_seed, memo_key, statements
+
+    # Runs on a prefetch thread. Memoized quizzes need no sentences, and documents in chunked
+    # mode get None: their sentences are sampled once the quiz terms are known.
+    def load_sentences(plan, load_metrics):
+        row, _, _, statements = plan
+        file_path = file_paths[row]
+        if statements is not None or file_path in chunked_encodings:
+            return plan, None
+        if keep_documents:
+            return plan, kept_artifacts[row].sentences
+        with load_metrics.stage('load'):
+            if cache is not None:
+                return plan, cache.load_artifacts(file_path, vocabulary=vocabulary).sentences
+            return plan, split_sentences(load_text(file_path))
+
+    def select_terms(row, digest, file_seed):
+        cache_key = None
+        if cache is not None:
+            cache_key = hashlib.sha256(
+                f"terms:{digest}:{fingerprint}:{N_QUIZ_TERMS}:{TERM_VARIATION}:{file_seed}".encode('utf-8')
+            ).hexdigest()
+            quiz_terms = cache.get(cache_key)
+            if quiz_terms is not None:
+                return quiz_terms
+
+        if feature_names is None:
+            tfidf_terms, tfidf_scores = np.array([], dtype=object), np.array([])
+        else:
+            tfidf_terms, tfidf_scores = tfidf_row_arrays(tfidf_matrix, row, feature_names)
+        quiz_terms = select_top_quiz_terms(
+            tfidf_terms, tfidf_scores, n_terms=N_QUIZ_TERMS, variation=TERM_VARIATION, seed=file_seed,
+        )
+        if cache_key is not None:
+            cache.put(cache_key, quiz_terms)
+        return quiz_terms
+
+    # Yields (file name, memo key, job, statements): a memoized quiz comes with its statements and no job
+    def iter_jobs():
+        # Kept documents are already in memory, so there is nothing to read ahead
+        plans = iter_prefetched(load_sentences, iter_plans(), 0 if keep_documents else prefetch, metrics)
+        for (row, file_seed, memo_key, statements), sentences in plans:
+            file_path, file_name, digest = file_paths[row], file_names[row], digests[row]
+            if statements is not None:
+                yield file_name, memo_key, None, statements
+                continue
+
+            with metrics.stage('select_terms'):
+                quiz_terms = select_terms(row, digest, file_seed)
+                term_similarity = None
+                if feature_names is not None and quiz_terms:
+                    term_similarity = corpus_term_similarity(tfidf_columns, feature_names, quiz_terms)
+            metrics.count('quiz_terms', len(quiz_terms))
+            if sentences is None:
+                with metrics.stage('load'):
+                    sentences = sample_term_sentences(
+                        file_path, chunked_encodings[file_path], quiz_terms, chunk_size=chunk_size,
+                        metrics=metrics, seed=derive_file_seed(file_seed, 'reservoir'),
+                    )
+                metrics.count('sentences', len(sentences))
+            yield file_name, memo_key, (sentences, quiz_terms, num_questions, file_seed, term_similarity), None
+
+    def finish(memo_key, statements):
+        if memo is not None and memo_key is not None:
+            memo.put(memo_key, statements)
+        return statements
+
+    try:
+        if workers > 1 and len(file_names) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                # Under fork, the first task starts every worker. Waiting on it before iter_jobs starts its
+                # loader threads keeps a child from inheriting a lock one of them holds.
+                executor.submit(int).result()
+                # Keep a bounded number of files in flight and yield them in submission order,
+                # whatever order the workers finish in.
+                pending = collections.deque()
+
+                def next_result():
+                    file_name, memo_key, future, statements = pending.popleft()
+                    if future is not None:
+                        statements, worker_metrics = future.result()
+                        metrics.merge(worker_metrics)
+                        statements = finish(memo_key, statements)
+                    return file_name, statements
+
+                for file_name, memo_key, job, statements in iter_jobs():
+                    future = executor.submit(_generate_statements_in_worker, job) if job is not None else None
+                    pending.append((file_name, memo_key, future, statements))
+                    if len(pending) >= workers * 2:
+                        yield next_result()
+                while pending:
+                    yield next_result()
+        else:
+            for file_name, memo_key, job, statements in iter_jobs():
+                if job is not None:
+                    statements = finish(memo_key, _generate_statements_job(job, metrics=metrics))
+                yield file_name, statements
+    finally:
+        if cache is not None:
+            cache.save()
+
+
+# Main function to handle multiple text files
+def generate_quizzes_for_files(file_paths, num_questions, model_path=None, workers=1, seed=None, cache=None,
+                               metrics=None, chunk_size=None, memo=None, prefetch=PREFETCH_DEPTH, vocabulary=None):
+    """
+    Generates quizzes for multiple text files.
+
+    The TF-IDF model is fitted once over all files, so each term is weighted
+    against the whole Test Bank rather than against its own document only.
+    Statement generation can then be spread over a pool of worker processes.
+    Each file gets its own seed derived from the run seed, so a seeded run
+    produces the same quizzes whatever the number of workers.
+
+    Args:
+        file_paths (list): List of file paths to process.
+        num_questions (int): Number of questions to generate for each file.
+        model_path (str): Where to save the fitted TF-IDF model. It is reused on later runs
+            as long as the corpus is unchanged.
+        workers (int): Number of worker processes. 1 processes the files in this process.
+        seed (int): Seed for the run. If None, a random seed is drawn.
+        cache (DocumentCache): Cache of per-document artifacts. If given, only files whose
+            contents changed since the last run are reprocessed.
+        metrics (PipelineMetrics): Receives per-stage timings and counters.
+        chunk_size (int): Enables chunked mode for files larger than this many bytes: they are
+            streamed in windows of about this many characters and never loaded whole.
+        memo (QuizMemo): If given, quizzes already generated for the same document, corpus,
+            parameters and seed are returned from it instead of being generated again.
+        prefetch (int): Number of files read ahead on background threads while earlier ones
+            are processed (see iter_prefetched). 0 reads each file when it is needed.
+        vocabulary (VocabularyOptions): Vocabulary mode: phrase terms of several words, and
+            document-frequency and size limits on the corpus vocabulary. If None, every single
+            word but stop words is a candidate term.
+
+    Returns:
+        dict: A dictionary where keys are file names and values are lists of True/False statements.
+
+    Raises:
+        ValueError: If two files have the same name, as in different subdirectories.
+    """
+    # Store the quiz statements for each file
+    return dict(_iter_quizzes(
+        file_paths, num_questions, model_path, workers, seed, cache, True, metrics, chunk_size, memo, prefetch,
+        vocabulary,
+    ))
+
+
+# Streaming variant for large Test Banks
+def iter_quizzes_for_files(file_paths, num_questions, model_path=None, workers=1, seed=None, cache=None,
+                           metrics=None, chunk_size=None, memo=None, prefetch=PREFETCH_DEPTH, vocabulary=None):
+    """
+    Generates quizzes for multiple text files, yielding each file's quiz as soon as it is ready.
+
+    Unlike generate_quizzes_for_files, documents are loaded one at a time and dropped
+    once their quiz is yielded, so memory does not grow with the size of the corpus.
+    Files are read twice instead (term counts, then generation), or read back from
+    the cache if one is given. Seeded runs yield the same quizzes as generate_quizzes_for_files.
+
+    Args:
+        file_paths (list): List of file paths to process.
+        num_questions (int): Number of questions to generate for each file.
+        model_path (str): Where to save the fitted TF-IDF model.
+        workers (int): Number of worker processes. 1 processes the files in this process.
+        seed (int): Seed for the run. If None, a random seed is drawn.
+        cache (DocumentCache): Cache of per-document artifacts.
+        metrics (PipelineMetrics): Receives per-stage timings and counters.
+        chunk_size (int): Enables chunked mode for files larger than this many bytes. Their
+            memory use is then bounded by the window size rather than by the file size.
+        memo (QuizMemo): Memo of generated quizzes. A memoized file is not read again.
+        prefetch (int): Number of files read ahead on background threads, in both passes.
+            At most this many loaded documents wait for processing at a time.
+        vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits.
+
+    Yields:
+        tuple: The file name and its list of (statement, answer) tuples, in input order.
+
+    Raises:
+        ValueError: If two files have the same name, as in different subdirectories.
+    """
+    yield from _iter_quizzes(
+        file_paths, num_questions, model_path, workers, seed, cache, False, metrics, chunk_size, memo, prefetch,
+        vocabulary,
+    )
+
+
+# Resident engine for on-demand quiz requests
+class QuizEngine:
+    """
+    Loads and preprocesses the Test Bank once, then generates quizzes from memory.
+
+    The corpus TF-IDF model, each document's sentences and scores, and a sentence
+    index of the terms that term selection can reach are all built up front, so
+    generate only selects terms and draws statements.
+    For a given seed, generate returns the same quiz as generate_quizzes_for_files
+    does for a file whose derived seed (see derive_file_seed) is that seed.
+    """
+
+    def __init__(self, file_paths=None, input_dir=TEST_BANK_DIR, model_path=None, cache=None, metrics=None,
+                 memo=None, vocabulary=None):
+        """
+        Args:
+            file_paths (list): Files to serve. Defaults to every .txt file under input_dir.
+            input_dir (str): The Test Bank directory, used when file_paths is None.
+            model_path (str): Where the corpus TF-IDF model is saved. If None, it is not persisted.
+            cache (DocumentCache): Cache of per-document artifacts used while loading.
+            metrics (PipelineMetrics): Receives timings and counters, both while loading and for
+                every generated quiz.
+            memo (QuizMemo): Memo of generated quizzes, shared with generate_quizzes_for_files:
+                a quiz requested again with the same seed is returned from it.
+            vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits.
+
+        Raises:
+            ValueError: If two files have the same name, as in different subdirectories.
+        """
+        import numpy as np
+
+        self.metrics = _metrics_or_null(metrics)
+        self._memo = memo
+        if file_paths is None:
+            file_paths = discover_test_bank_files(input_dir)
+
+        file_names = _file_names(file_paths)
+        all_artifacts = list(iter_prefetched(
+            lambda file_path, load_metrics: _load_artifacts(file_path, cache, load_metrics, vocabulary=vocabulary),
+            file_paths,
+            metrics=self.metrics,
+        ))
+        if cache is not None:
+            cache.save()
+
+        digests = [artifacts.digest for artifacts in all_artifacts]
+        self._digests = dict(zip(file_names, digests))
+        self._fingerprint = _vocabulary_fingerprint(corpus_fingerprint_from_digests(file_names, digests), vocabulary)
+        with self.metrics.stage('tfidf'):
+            model, tfidf_matrix = load_or_fit_corpus_tfidf_from_counts(
+                file_names, digests, [artifacts.term_counts for artifacts in all_artifacts], model_path, vocabulary,
+            )
+        feature_names = model.get_feature_names_out() if model is not None else None
+        self._feature_names = feature_names
+        self._tfidf_columns = tfidf_matrix.tocsc() if model is not None else None
+
+        self._documents = {}
+        self._variant_pools = {}
+        for row, (file_name, artifacts) in enumerate(zip(file_names, all_artifacts)):
+            if feature_names is None:
+                tfidf_terms, tfidf_scores = np.array([], dtype=object), np.array([])
+            else:
+                tfidf_terms, tfidf_scores = tfidf_row_arrays(tfidf_matrix, row, feature_names)
+            # Term selection never reaches past the top N_QUIZ_TERMS * TERM_VARIATION terms, so index those now
+            window = np.argsort(-tfidf_scores, kind='stable')[:N_QUIZ_TERMS * TERM_VARIATION]
+            sentence_index = self._index_terms(artifacts.sentences, tfidf_terms[window].tolist(), {})
+            self._documents[file_name] = (artifacts.sentences, tfidf_terms, tfidf_scores, sentence_index)
+
+    @staticmethod
+    def _index_terms(sentences, terms, sentence_index):
+        # Terms found in no sentence are stored as empty lists, so they are only scanned once
+        sentence_index.update(dict.fromkeys(terms, []))
+        sentence_index.update(build_sentence_index(sentences, terms))
+        return sentence_index
+
+    @property
+    def files(self):
+        """
+        list: Names of the files the engine can generate quizzes for.
+        """
+        return list(self._documents)
+
+    def generate(self, file_name, num_questions=5, seed=None):
+        """
+        Generates a quiz for one loaded file.
+
+        Args:
+            file_name (str): Name of the file, one of files.
+            num_questions (int): Number of questions to generate.
+            seed (int): Seed for the quiz. If None, a random seed is drawn.
+
+        Returns:
+            list: The generated (statement, answer) tuples.
+
+        Raises:
+            KeyError: If the file is not loaded.
+        """
+        if file_name not in self._documents:
+            raise KeyError(f"Unknown file: {file_name}")
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+
+        memo_key = None
+        if self._memo is not None:
+            memo_key = self._memo.key(self._digests[file_name], self._fingerprint, num_questions, seed)
+            statements = self._memo.get(memo_key, self.metrics)
+            if statements is not None:
+                return statements
+
+        sentences, tfidf_terms, tfidf_scores, sentence_index = self._documents[file_name]
+        with self.metrics.stage('select_terms'):
+            quiz_terms = select_top_quiz_terms(
+                tfidf_terms, tfidf_scores, n_terms=N_QUIZ_TERMS, variation=TERM_VARIATION, seed=seed,
+            )
+            missing_terms = [term for term in quiz_terms if term not in sentence_index]
+            if missing_terms:
+                self._index_terms(sentences, missing_terms, sentence_index)
+
+            term_similarity = None
+            if self._feature_names is not None and quiz_terms:
+                term_similarity = corpus_term_similarity(self._tfidf_columns, self._feature_names, quiz_terms)
+        job = (sentences, quiz_terms, num_questions, seed, term_similarity)
+        statements = _generate_statements_job(job, sentence_index, self.metrics)
+        if memo_key is not None:
+            self._memo.put(memo_key, statements)
+        return statements
+
+    def _variant_pool(self, file_name):
+        # Everything variants of one file share: the candidate sentences with the pool terms they
+        # mention (CSR layout), the term spans, and each pool term's closest distractors.
+        import numpy as np
+
+        pool = self._variant_pools.get(file_name)
+        if pool is not None:
+            return pool
+
+        sentences, tfidf_terms, tfidf_scores, sentence_index = self._documents[file_name]
+        window = np.argsort(-tfidf_scores, kind='stable')[:N_QUIZ_TERMS * TERM_VARIATION]
+        pool_terms = [term for term in tfidf_terms[window].tolist() if sentence_index.get(term)]
+
+        # One candidate per distinct sentence text, so a variant never repeats a statement
+        occurrences = collections.defaultdict(list)
+        for term_id, term in enumerate(pool_terms):
+            for sentence_id, spans in sentence_index[term]:
+                occurrences[sentence_id].append((term_id, spans))
+        candidate_ids, term_ptr, candidate_terms, candidate_spans, seen_texts = [], [0], [], [], set()
+        for sentence_id in sorted(occurrences):
+            text = sentences[sentence_id].strip()
+            if text in seen_texts:
+                continue
+            seen_texts.add(text)
+            candidate_ids.append(sentence_id)
+            for term_id, spans in occurrences[sentence_id]:
+                candidate_terms.append(term_id)
+                candidate_spans.append(spans)
+            term_ptr.append(len(candidate_terms))
+
+        term_similarity = None
+        if self._feature_names is not None and pool_terms:
+            term_similarity = corpus_term_similarity(self._tfidf_columns, self._feature_names, pool_terms)
+        distractors = build_distractor_table(pool_terms, sentence_index, len(sentences), term_similarity)
+        term_ids = {term: term_id for term_id, term in enumerate(pool_terms)}
+        choices = min(DISTRACTOR_CHOICES, max(len(pool_terms) - 1, 0))
+        distractor_ids = np.array(
+            [[term_ids[other] for other in distractors[term][:choices]] for term in pool_terms], dtype=np.int64,
+        ).reshape(len(pool_terms), choices)
+
+        pool = (
+            sentences, pool_terms, np.array(candidate_ids, dtype=np.int64), np.array(term_ptr, dtype=np.int64),
+            np.array(candidate_terms, dtype=np.int64), candidate_spans, distractor_ids,
+        )
+        self._variant_pools[file_name] = pool
+        return pool
+
+    def generate_variants(self, file_name, num_variants, num_questions=5, seed=None, max_overlap=None):
+        """
+        Generates many distinct quizzes for one loaded file in a single call.
+
+        Variants are drawn from the sentences that mention any of the top
+        N_QUIZ_TERMS * TERM_VARIATION terms, with that candidate pool and the
+        distractor table built once per file. All variants are sampled together from
+        one NumPy generator: each takes num_questions distinct sentences, then a term
+        of each sentence, whether the statement is true, and a distractor for false ones.
+
+        Args:
+            file_name (str): Name of the file, one of files.
+            num_variants (int): Number of quizzes to generate.
+            num_questions (int): Number of questions per quiz.
+            seed (int): Seed for the variants. If None, a random seed is drawn.
+            max_overlap (int): If given, no two variants share more than this many sentences.
+                Variants are then drawn one after the other, and a variant is left short
+                if the pool cannot satisfy the limit.
+
+        Returns:
+            list: num_variants Statements, each a quiz of (statement, answer) tuples.
+
+        Raises:
+            KeyError: If the file is not loaded.
+        """
+        import numpy as np
+
+        if file_name not in self._documents:
+            raise KeyError(f"Unknown file: {file_name}")
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+
+        with self.metrics.stage('select_terms'):
+            sentences, pool_terms, candidate_ids, term_ptr, candidate_terms, candidate_spans, distractor_ids = (
+                self._variant_pool(file_name)
+            )
+        with self.metrics.stage('generate_statements'):
+            num_candidates = len(candidate_ids)
+            k = min(num_questions, num_candidates)
+            if not k:
+                return [[] for _ in range(num_variants)]
+            rng = np.random.default_rng(seed)
+
+            if max_overlap is None:
+                # Sampling without replacement for a block of variants at once: the k smallest
+                # of independent uniform keys. Blocks bound the keys matrix to a few million entries.
+                block = max(1, (1 << 22) // num_candidates)
+                picks = []
+                for start in range(0, num_variants, block):
+                    keys = rng.random((min(block, num_variants - start), num_candidates))
+                    picks.append(np.argpartition(keys, k - 1, axis=1)[:, :k])
+                picks = np.concatenate(picks) if picks else np.empty((0, k), dtype=np.int64)
+            else:
+                picks = self._draw_with_max_overlap(rng, num_variants, num_candidates, k, max_overlap)
+
+            # One vectorized draw each for the term, the answer and the distractor of every pick
+            mentions = term_ptr[picks + 1] - term_ptr[picks]
+            term_slots = term_ptr[picks] + (rng.random(picks.shape) * mentions).astype(np.int64)
+            answers = rng.random(picks.shape) < 0.5
+            choices = distractor_ids.shape[1]
+            distractor_slots = rng.integers(0, max(choices, 1), size=picks.shape)
+            if not choices:
+                answers[:] = True  # A lone term has nothing to be swapped with
+
+            term_slots[picks < 0] = 0  # Slots of empty picks are never read, but must be valid indices
+            replacement_ids = distractor_ids[candidate_terms[term_slots], distractor_slots] if choices else None
+            variants = []
+            for row in range(num_variants):
+                statements = Statements(sentences, pool_terms)
+                for column in range(picks.shape[1]):
+                    candidate = picks[row, column]
+                    if candidate < 0:
+                        continue  # Left empty by the overlap limit
+                    slot = term_slots[row, column]
+                    if answers[row, column]:
+                        statements.append(candidate_ids[candidate], candidate_terms[slot])
+                    else:
+                        statements.append(
+                            candidate_ids[candidate], candidate_terms[slot], replacement_ids[row, column],
+                            candidate_spans[slot],
+                        )
+                variants.append(statements)
+            self.metrics.count('statements', sum(len(statements) for statements in variants))
+        return variants
+
+    @staticmethod
+    def _draw_with_max_overlap(rng, num_variants, num_candidates, k, max_overlap):
+        # Greedy: each variant takes candidates in its own random order, skipping any that would
+        # give it more than max_overlap sentences in common with an earlier variant.
+        import numpy as np
+
+        picks = np.full((num_variants, k), -1, dtype=np.int64)
+        users = [[] for _ in range(num_candidates)]  # Variants that picked each candidate
+        for variant in range(num_variants):
+            shared = np.zeros(num_variants, dtype=np.int64)
+            taken = 0
+            for candidate in rng.permutation(num_candidates):
+                previous = users[candidate]
+                if previous:
+                    if shared[previous].max() >= max_overlap:
+                        continue
+                    shared[previous] += 1
+                previous.append(variant)
+                picks[variant, taken] = candidate
+                taken += 1
+                if taken == k:
+                    break
+        short = int((picks[:, -1] < 0).sum())
+        if short:
+            logger.warning("%d of %d variants have fewer than %d questions: the overlap limit leaves no more "
+                           "sentences.", short, num_variants, k)
+        return picks
+
+
+# Many quiz variants per file, e.g. one per student
+def generate_quiz_variants_for_files(file_paths, num_variants, num_questions, model_path=None, seed=None, cache=None,
+                                     max_overlap=None, metrics=None, vocabulary=None):
+    """
+    Generates num_variants distinct quizzes for each of multiple text files.
+
+    Loading, the corpus TF-IDF model and the candidate sentences of each file are
+    computed once and shared by all its variants (see QuizEngine.generate_variants).
+
+    Args:
+        file_paths (list): List of file paths to process.
+        num_variants (int): Number of quizzes to generate for each file.
+        num_questions (int): Number of questions per quiz.
+        model_path (str): Where to save the fitted TF-IDF model.
+        seed (int): Seed for the run. If None, a random seed is drawn. Each file's variants
+            are drawn with a seed derived from it, as in generate_quizzes_for_files.
+        cache (DocumentCache): Cache of per-document artifacts.
+        max_overlap (int): If given, no two variants of a file share more than this many sentences.
+        metrics (PipelineMetrics): Receives per-stage timings and counters.
+        vocabulary (VocabularyOptions): Phrase lengths and vocabulary limits.
+
+    Returns:
+        dict: A dictionary where keys are file names and values are lists of variants,
+        each a list of (statement, answer) tuples.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    engine = QuizEngine(file_paths, model_path=model_path, cache=cache, metrics=metrics, vocabulary=vocabulary)
+    return {
+        file_name: engine.generate_variants(
+            file_name, num_variants, num_questions, derive_file_seed(seed, file_name), max_overlap,
+        )
+        for file_name in engine.files
+    }
+
+
+# Writers for each output format; one instance writes either the answers or the questions file
+class _QuizWriter:
+    def __init__(self, file, with_answers):
+        self.file = file
+        self.with_answers = with_answers
+
+    def begin(self):
+        pass
+
+    def write_quiz(self, file_name, statements):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+    def _record(self, statement, is_true):
+        record = {"statement": statement.strip()}
+        if self.with_answers:
+            record["answer"] = is_true
+        return record
+
+
+class _TextQuizWriter(_QuizWriter):
+    def write_quiz(self, file_name, statements):
+        self.file.write(f"Quiz for {file_name}:\n")
+        for i, (statement, is_true) in enumerate(statements, 1):
+            self.file.write(f"Statement {i}: {statement.strip()}\n")
+            if self.with_answers:
+                self.file.write(f"Answer: {'True' if is_true else 'False'}\n")
+            self.file.write("\n")
+        self.file.write("=" * 40 + "\n\n")
+
+
+class _JsonQuizWriter(_QuizWriter):
+    # Writes one JSON object incrementally, so quizzes can be streamed into it
+    def begin(self):
+        self.file.write("{")
+        self.separator = "\n"
+
+    def write_quiz(self, file_name, statements):
+        records = [self._record(statement, is_true) for statement, is_true in statements]
+        self.file.write(f"{self.separator}  {json.dumps(file_name)}: {json.dumps(records)}")
+        self.separator = ",\n"
+
+    def end(self):
+        self.file.write("\n}\n")
+
+
+class _JsonLinesQuizWriter(_QuizWriter):
+    def write_quiz(self, file_name, statements):
+        for i, (statement, is_true) in enumerate(statements, 1):
+            record = {"file": file_name, "number": i, **self._record(statement, is_true)}
+            self.file.write(json.dumps(record) + "\n")
+
+
+class _CsvQuizWriter(_QuizWriter):
+    def begin(self):
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["file", "number", "statement"] + (["answer"] if self.with_answers else []))
+
+    def write_quiz(self, file_name, statements):
+        for i, (statement, is_true) in enumerate(statements, 1):
+            row = [file_name, i, statement.strip()]
+            if self.with_answers:
+                row.append("True" if is_true else "False")
+            self.writer.writerow(row)
+
+
+QUIZ_WRITERS = {
+    'txt': _TextQuizWriter,
+    'json': _JsonQuizWriter,
+    'jsonl': _JsonLinesQuizWriter,
+    'csv': _CsvQuizWriter,
+}
+
+
+def export_quiz_stream(quiz_stream, output_dir="Quizzes", output_format="txt", metrics=None):
+    """
+    Exports quizzes as they arrive to two files: one with answers and one without.
+
+    Each quiz is written and flushed as soon as it is received, so readers of the
+    output files can start before the run finishes.
+
+    Args:
+        quiz_stream (iterable): (file name, list of (statement, answer) tuples) pairs,
+            such as the ones yielded by iter_quizzes_for_files.
+        output_dir (str): Directory where output files will be saved.
+        output_format (str): One of OUTPUT_FORMATS.
+        metrics (PipelineMetrics): Receives the time spent writing, as the export stage.
+
+    Returns:
+        tuple: Paths of the two output files.
+    """
+    metrics = _metrics_or_null(metrics)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    with_answers_file = os.path.join(output_dir, f"quiz-with-answers-{timestamp}.{output_format}")
+    without_answers_file = os.path.join(output_dir, f"quiz-without-answers-{timestamp}.{output_format}")
+
+    newline = "" if output_format == "csv" else None
+    with open(with_answers_file, "w", newline=newline) as answers_file, \
+            open(without_answers_file, "w", newline=newline) as questions_file:
+        writer_class = QUIZ_WRITERS[output_format]
+        writers = [writer_class(answers_file, with_answers=True), writer_class(questions_file, with_answers=False)]
+        for writer in writers:
+            writer.begin()
+
+        for file_name, statements in quiz_stream:
+            with metrics.stage('export'):
+                for writer in writers:
+                    writer.write_quiz(file_name, statements)
+                    writer.file.flush()
+
+        for writer in writers:
+            writer.end()
+
+    return with_answers_file, without_answers_file
+
+
+def export_quizzes_to_files(quizzes, output_dir="Quizzes", output_format="txt"):
+    """
+    Exports quizzes to files: one with answers and one without.
+
+    Args:
+        quizzes (dict): A dictionary where keys are file names and values are lists of (statement, answer) tuples.
+        output_dir (str): Directory where output files will be saved.
+        output_format (str): One of OUTPUT_FORMATS: "txt" for readable text, or "json", "jsonl"
+            or "csv" for machine-readable output.
+
+    Returns:
+        tuple: Paths of the two output files.
+    """
+    return export_quiz_stream(quizzes.items(), output_dir, output_format)
+
+
+def _document_frequency(value):
+    # A document count, or a share of the documents when written with a decimal point
+    return float(value) if '.' in value else int(value)
+
+
+def _phrase_length(value):
+    # A phrase has at least one word; 0 would give an empty range of lengths
+    length = int(value)
+    if length < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return length
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments.
+
+    Args:
+        argv (list): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Generate True/False quizzes from Test Bank text files.")
+    parser.add_argument(
+        "files", nargs="*",
+        help="Files in the input directory to generate quizzes for (default: every .txt file in it).",
+    )
+    parser.add_argument("-i", "--input-dir", default=TEST_BANK_DIR, help="Directory containing the text files.")
+    parser.add_argument("-n", "--num-questions", type=int, default=5, help="Number of questions per file.")
+    parser.add_argument(
+        "-f", "--format", dest="output_format", choices=OUTPUT_FORMATS, default="txt", help="Output file format.",
+    )
+    parser.add_argument("-o", "--output-dir", default=QUIZZES_DIR, help="Directory where quizzes are written.")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of worker processes used to generate quizzes (default: 1).",
+    )
+    parser.add_argument("--seed", type=int, help="Seed for reproducible quizzes.")
+    parser.add_argument(
+        "--model-path", default=MODEL_PATH,
+        help="Where the corpus TF-IDF model is saved. Pass an empty string to disable saving.",
+    )
+    parser.add_argument(
+        "--cache-dir", default=DOCUMENT_CACHE_DIR,
+        help="Where per-document artifacts are cached. Pass an empty string to disable the cache.",
+    )
+    parser.add_argument(
+        "--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level (default: WARNING).",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="Print per-stage timings and counters at the end of the run.",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=DOCUMENT_CACHE_BYTES // (1024 * 1024),
+        help="Size limit of the document cache in MB (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=PREFETCH_DEPTH,
+        help="Number of files read ahead while earlier ones are processed; 0 disables read-ahead "
+             "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--ngrams", type=_phrase_length, default=1,
+        help="Longest phrase, in words, that can be a quiz term, e.g. 2 for \"linked list\" (default: 1).",
+    )
+    parser.add_argument(
+        "--min-df", type=_document_frequency, default=1,
+        help="Drop terms found in fewer documents; a fraction such as 0.1 is a share of the documents.",
+    )
+    parser.add_argument(
+        "--max-df", type=_document_frequency, default=1.0,
+        help="Drop terms found in more documents; a fraction such as 0.9 is a share of the documents.",
+    )
+    parser.add_argument(
+        "--max-features", type=int, help="Keep at most this many terms in the corpus vocabulary, the most frequent.",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=0,
+        help="Stream files larger than this many MB in windows of this size, so memory stays bounded "
+             "however large they are (default: 0, load every file whole).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Generates quizzes for the requested Test Bank files and exports them.
+
+    Args:
+        argv (list): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        tuple: Paths of the two output files.
+    """
+    args = parse_args(argv)
+
+    if args.files:
+        file_paths = [os.path.join(args.input_dir, file_name) for file_name in args.files]
+    else:
+        file_paths = discover_test_bank_files(args.input_dir)
+
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s")
+    metrics = PipelineMetrics()
+
+    cache = DocumentCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+    chunk_size = args.chunk_size * 1024 * 1024 if args.chunk_size else None
+    vocabulary = VocabularyOptions((1, args.ngrams), args.min_df, args.max_df, args.max_features)
+    if vocabulary == VocabularyOptions():
+        vocabulary = None
+    # Unseeded runs never repeat a quiz, so only seeded runs are memoized
+    memo = QuizMemo(cache=cache) if cache is not None and args.seed is not None else None
+    quiz_stream = iter_quizzes_for_files(
+        file_paths, args.num_questions, args.model_path or None, workers=args.workers, seed=args.seed, cache=cache,
+        metrics=metrics, chunk_size=chunk_size, memo=memo, prefetch=args.prefetch, vocabulary=vocabulary,
+    )
+    with_answers_file, without_answers_file = export_quiz_stream(
+        quiz_stream, args.output_dir, args.output_format, metrics,
+    )
+
+    print(f"Quizzes exported:")
+    print(f"With answers: {with_answers_file}")
+    print(f"Without answers: {without_answers_file}")
+    if args.metrics:
+        print(metrics.summary())
+    return with_answers_file, without_answers_file
 
-# Export quizzes to the "Quizzes" directory
-output_dir = os.path.join(os.path.dirname(__file__), 'Quizzes')
-with_answers_file, without_answers_file = export_quizzes_to_files(quizzes, output_dir)
 
-print(f"Quizzes exported:")
-print(f"With answers: {with_answers_file}")
-print(f"Without answers: {without_answers_file}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import generate_quiz
+
+# Requests larger than this are rejected before they are parsed
+MAX_HEADER_BYTES = 16 * 1024
+
+# No route reads a request body; larger ones are rejected instead of drained
+MAX_BODY_BYTES = 64 * 1024
+
+
+class RequestError(Exception):
+    """
+    An error reported to the client with an HTTP status and a JSON body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(params, name, default):
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+
+
+def handle_request(engine, method, target):
+    """
+    Routes one request to the quiz engine.
+
+    Routes:
+        GET /health: {"status": "ok"}.
+        GET /files: {"files": [...]}, the files quizzes can be generated for.
+        GET /metrics: the engine's per-stage timings and counters.
+        GET /quiz?file=NAME&num_questions=5&seed=1&answers=1: the quiz for one file.
+            seed is optional and echoed back; answers=0 leaves the answers out.
+
+    Args:
+        engine (generate_quiz.QuizEngine): The loaded engine.
+        method (str): The HTTP method.
+        target (str): The request target, path and query string.
+
+    Returns:
+        tuple: The HTTP status and the JSON-serializable response body.
+    """
+    if method != 'GET':
+        return HTTPStatus.METHOD_NOT_ALLOWED, {'error': f"Method not allowed: {method}"}
+
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    try:
+        if url.path == '/health':
+            return HTTPStatus.OK, {'status': 'ok'}
+
+        if url.path == '/files':
+            return HTTPStatus.OK, {'files': engine.files}
+
+        if url.path == '/metrics':
+            return HTTPStatus.OK, engine.metrics.snapshot()
+
+        if url.path == '/quiz':
+            file_name = params.get('file', [None])[0]
+            if not file_name:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Missing file parameter")
+            num_questions = _int_param(params, 'num_questions', 5)
+            if num_questions < 0:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "num_questions must not be negative")
+            # Draw the seed here so it can be returned and the quiz requested again
+            seed = _int_param(params, 'seed', None)
+            if seed is None:
+                seed = random.randrange(2 ** 63)
+            with_answers = _int_param(params, 'answers', 1) != 0
+
+            try:
+                statements = engine.generate(file_name, num_questions, seed)
+            except KeyError:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown file: {file_name}")
+
+            records = []
+            for statement, is_true in statements:
+                record = {'statement': statement.strip()}
+                if with_answers:
+                    record['answer'] = is_true
+                records.append(record)
+            return HTTPStatus.OK, {'file': file_name, 'seed': seed, 'statements': records}
+
+        raise RequestError(HTTPStatus.NOT_FOUND, f"Not found: {url.path}")
+    except RequestError as e:
+        return e.status, {'error': str(e)}
+
+
+async def _read_request(reader):
+    # Returns (method, target, keep_alive), or None once the client has closed the connection
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large")
+
+    lines = head.decode('latin1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            headers[name.strip().lower()] = value.strip()
+
+    # Request bodies are not used by any route, but must be drained to keep the connection usable
+    try:
+        content_length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length header")
+    if content_length < 0:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length header")
+    if content_length > MAX_BODY_BYTES:
+        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    if content_length:
+        await reader.readexactly(content_length)
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method, target, keep_alive
+
+
+def _write_response(writer, status, body, keep_alive):
+    payload = json.dumps(body).encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n".encode('latin1') + payload
+    )
+
+
+async def start_server(engine, host='127.0.0.1', port=8000):
+    """
+    Starts serving quizzes from the engine over HTTP.
+
+    Generating a quiz from the loaded engine takes about a millisecond, so requests
+    are answered directly on the event loop; connections are kept alive so clients
+    can send many requests without reconnecting.
+
+    Args:
+        engine (generate_quiz.QuizEngine): The loaded engine.
+        host (str): Interface to listen on.
+        port (int): Port to listen on. 0 picks a free port.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except RequestError as e:
+                    _write_response(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, target, keep_alive = request
+                status, body = handle_request(engine, method, target)
+                _write_response(writer, status, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle_connection, host, port, limit=MAX_HEADER_BYTES)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments.
+
+    Args:
+        argv (list): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Serve True/False quizzes from the Test Bank over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1).")
+    parser.add_argument("-p", "--port", type=int, default=8000, help="Port to listen on (default: 8000).")
+    parser.add_argument(
+        "-i", "--input-dir", default=generate_quiz.TEST_BANK_DIR, help="Directory containing the text files.",
+    )
+    parser.add_argument(
+        "--model-path", default=generate_quiz.MODEL_PATH,
+        help="Where the corpus TF-IDF model is saved. Pass an empty string to disable saving.",
+    )
+    parser.add_argument(
+        "--cache-dir", default=generate_quiz.DOCUMENT_CACHE_DIR,
+        help="Where per-document artifacts are cached. Pass an empty string to disable the cache.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Loads the Test Bank into a QuizEngine and serves it until interrupted.
+
+    Args:
+        argv (list): Command-line arguments. Defaults to sys.argv[1:].
+    """
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    cache = generate_quiz.DocumentCache(args.cache_dir) if args.cache_dir else None
+    engine = generate_quiz.QuizEngine(
+        input_dir=args.input_dir, model_path=args.model_path or None, cache=cache,
+        metrics=generate_quiz.PipelineMetrics(), memo=generate_quiz.QuizMemo(),
+    )
+    print(f"Loaded {len(engine.files)} files in {time.perf_counter() - start:.2f}s")
+
+    async def serve():
+        server = await start_server(engine, args.host, args.port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving quizzes on http://{host}:{port}/quiz?file=NAME")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()